@@ -1,4 +1,9 @@
-from panda3d.core import Vec2, Point2
+# Vectors (in src) has the same Vec2 and Point2 without importing Panda3D;
+# this directory's own MovingObject still uses Panda's
+try:
+    from Vectors import Vec2, Point2
+except ImportError:
+    from panda3d.core import Vec2, Point2
 from MovingObject import MovingObject, normalizeDegrees
 from math import*
 from heapq import*
@@ -0,0 +1,160 @@
+# Reloads an AI class when the source of its module changes.
+#
+# AsteroidsDemo takes seconds to open its window and load its models, so
+# with --reload it keeps running while the AI is edited: an AIReloader
+# watches the files of the AI's module and of the local modules it uses,
+# and after an edit the window builds the new class and restarts the game.
+#
+# The watched modules are the AI's module and, recursively, the modules its
+# globals come from (imported modules, or classes and functions imported
+# from them) that live in the same directory, e.g. ThreatCache for ShipAI.
+# On a change all of them are reloaded, dependencies first.
+#
+# Modules the game uses as well are left out, with the modules only they
+# use: MovingObject is the class of the WorldView's objects and the game
+# keeps the one it imported, so a reloaded AI would see objects of a class
+# that is no longer its own.  So edits to MovingObject.py, Vectors.py,
+# SecondOrderPoly.py and the like need a restart; changedShared() tells
+# which of them were edited.  The AI's own module is always reloaded, even
+# though Simulation imports ShipAI: the game only plays the class it gets
+# from the reloader.
+#
+# A module is given by name, e.g. ShipAI, or by the path of its file, e.g.
+# ../Asteroids/myShipAI.py, whose directory is then put on sys.path.  The
+# class has the name of the module unless className says otherwise.
+
+import importlib
+import os
+import sys
+import types
+
+try:
+	from importlib import reload
+except ImportError:
+	from imp import reload
+
+class AIReloader:
+	def __init__(self, module, className=None):
+		if module.endswith(".py"):
+			directory = os.path.dirname(os.path.abspath(module))
+			if directory not in sys.path:
+				sys.path.append(directory)
+			module = os.path.splitext(os.path.basename(module))[0]
+		self.moduleName = module
+		self.className = className or module
+		self.module = importlib.import_module(module)
+		self.directory = os.path.dirname(os.path.abspath(self.module.__file__))
+		self.watch()
+
+	def aiClass(self):
+		return getattr(self.module, self.className)
+
+	# The watched modules, each after the ones it uses
+	def modules(self):
+		order = self.used()
+		shared = set(module.__name__ for module in self.shared(order))
+		return [module for module in order if module.__name__ not in shared]
+
+	# The AI's module and the local modules it uses, each after the ones it
+	# uses
+	def used(self):
+		order = []
+		seen = set()
+		def visit(module):
+			seen.add(module.__name__)
+			for dependency in self.dependencies(module):
+				if dependency.__name__ not in seen:
+					visit(dependency)
+			order.append(module)
+		visit(self.module)
+		return order
+
+	# The modules of used that the game uses too: those a module outside
+	# them, the window's __main__ included, takes globals from, and then
+	# those only such modules use
+	def shared(self, used):
+		inside = dict((module.__name__, module) for module in used if module is not self.module)
+		result = []
+		found = True
+		while found:
+			found = False
+			users = [module for module in list(sys.modules.values())
+					 if module != None and module.__name__ not in inside and module is not self.module and
+					 (module.__name__ == "__main__" or self.isLocal(module))]
+			for user in users:
+				for dependency in self.dependencies(user):
+					if dependency.__name__ in inside:
+						result.append(inside.pop(dependency.__name__))
+						found = True
+		return result
+
+	# The local modules the globals of module come from
+	def dependencies(self, module):
+		result = []
+		for value in list(vars(module).values()):
+			if isinstance(value, types.ModuleType):
+				dependency = value
+			else:
+				dependency = sys.modules.get(getattr(value, "__module__", None) or "")
+			if dependency != None and dependency is not module and dependency not in result and \
+			   self.isLocal(dependency):
+				result.append(dependency)
+		return result
+
+	def isLocal(self, module):
+		path = getattr(module, "__file__", None)
+		return module.__name__ != "__main__" and path != None and \
+			   os.path.dirname(os.path.abspath(path)) == self.directory
+
+	def sourceOf(self, module):
+		path = module.__file__
+		if path.endswith((".pyc", ".pyo")):
+			path = path[:-1]
+		return path
+
+	# Notes the modification times of the watched files and of the shared
+	# ones
+	def watch(self):
+		used = self.used()
+		shared = self.shared(used)
+		self.times = dict((self.sourceOf(module), self.modified(self.sourceOf(module)))
+						  for module in used if module not in shared)
+		self.sharedTimes = dict((self.sourceOf(module), self.modified(self.sourceOf(module)))
+								for module in shared)
+
+	def modified(self, path):
+		try:
+			return os.stat(path).st_mtime
+		except OSError:
+			return None
+
+	# True if a watched file changed since the last watch()
+	def changed(self):
+		for (path, mtime) in self.times.items():
+			if self.modified(path) != mtime:
+				return True
+		return False
+
+	# The files of shared modules changed since the last call, or watch().
+	# They are not reloaded; the game must be restarted to use them.
+	def changedShared(self):
+		result = []
+		for (path, mtime) in self.sharedTimes.items():
+			if self.modified(path) != mtime:
+				self.sharedTimes[path] = self.modified(path)
+				result.append(path)
+		return result
+
+	# Reloads the watched modules and returns the new class.  Raises what
+	# the import raises, e.g. a SyntaxError; the files are watched from
+	# their current version either way, so a broken edit is only reported
+	# once.
+	def reload(self):
+		try:
+			if hasattr(importlib, "invalidate_caches"):
+				importlib.invalidate_caches()
+			for module in self.modules():
+				reload(module)
+			return self.aiClass()
+		finally:
+			self.watch()
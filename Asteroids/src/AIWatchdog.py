@@ -0,0 +1,175 @@
+# Runs a ship AI under a real deadline.
+#
+# AIWatchdog wraps an AI and has the same newGame()/getAICommand() interface,
+# so it can be handed to Simulation in place of the AI.  Every getAICommand
+# call is passed to a worker thread; if the answer is not back within the
+# deadline (AI_TIME) the fallback command is returned instead and the miss is
+# counted.  While a late call is still running, later frames get the
+# fallback straight away.  Late commands are thrown away, but an error a
+# late call raised is raised by the next getAICommand() or newGame(), as it
+# would have been without the watchdog.
+#
+# The game moves the objects of its WorldView in place every frame, so the
+# worker is handed a copy of the asteroids that a late call can go on
+# reading.  Requests are numbered and a call only takes the answer with its
+# own number, so the late answer of an earlier call is never played.
+#
+# Fallbacks:
+#	"last"   -- the previous command again
+#	"idle"   -- (False, 0)
+#	"shield" -- None, i.e. raise the shield (once per game, as usual)
+#
+# The latencies of each game are kept, see histogram().  Timing makes the
+# game depend on the machine's load, so tournaments that must be repeatable
+# run the AI without a watchdog.
+
+import threading
+import time
+import traceback
+from WorldView import WorldView
+
+clock = getattr(time, "perf_counter", time.time)
+
+FALLBACKS = ["last", "idle", "shield"]
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, float("inf")]
+
+class AIWatchdog:
+	def __init__(self, shipAI, deadline, fallback="last"):
+		if fallback not in FALLBACKS:
+			raise ValueError("unknown fallback %r, expected one of %s" % (fallback, FALLBACKS))
+		self.shipAI = shipAI
+		self.deadline = deadline
+		self.fallback = fallback
+		self.lock = threading.Lock()
+		self.ready = threading.Event()
+		self.done = threading.Event()
+		self.busy = False
+		# The number of the last request, and (number, command, error) of the
+		# last answer
+		self.seq = 0
+		self.result = (0, None, None)
+		# Whether the last call missed its deadline and its result is unseen
+		self.abandoned = False
+		self.resetStats()
+
+		self.worker = threading.Thread(target=self.run, name="AIWatchdog")
+		self.worker.daemon = True
+		self.worker.start()
+
+	def resetStats(self):
+		self.latencies = []
+		self.calls = 0
+		self.missed = 0
+		self.lastCmd = (False, 0)
+
+	# Worker thread: answers one request at a time
+	def run(self):
+		while True:
+			self.ready.wait()
+			self.ready.clear()
+			(seq, asteroids, heading, framesToFire) = self.request
+			start = clock()
+			try:
+				result = (seq, self.shipAI.getAICommand(asteroids, heading, framesToFire), None)
+			except Exception as e:
+				result = (seq, None, e)
+			latency = clock() - start
+			with self.lock:
+				self.result = result
+				self.latencies.append(latency)
+				self.busy = False
+				self.done.set()
+
+	# Waits until the answer to request seq is in, at most timeout seconds if
+	# given.  True if it came.
+	def waitFor(self, seq, timeout=None):
+		end = None if timeout == None else clock() + timeout
+		while True:
+			with self.lock:
+				if self.result[0] == seq:
+					return True
+				self.done.clear()
+			remaining = None if end == None else end - clock()
+			if remaining != None and remaining <= 0:
+				return False
+			self.done.wait(remaining)
+
+	# Waits for a late call to finish, so it can't run into the new game
+	def newGame(self):
+		self.waitFor(self.seq)
+		self.raiseLateError()
+		self.resetStats()
+		self.shipAI.newGame()
+
+	# Hands later calls to another AI, e.g. one reloaded after an edit.  Call
+	# newGame() before asking it for commands.
+	def setAI(self, shipAI):
+		self.waitFor(self.seq)
+		try:
+			self.raiseLateError()
+		except Exception:
+			traceback.print_exc()
+		self.shipAI = shipAI
+
+	# Raises the error of the late call, if it raised one, once it is over
+	def raiseLateError(self):
+		if self.abandoned and not self.busy:
+			self.abandoned = False
+			(seq, cmd, error) = self.result
+			if error != None:
+				raise error
+
+	def getAICommand(self, asteroids, heading, framesToFire):
+		self.calls += 1
+		with self.lock:
+			late = self.busy
+			if not late:
+				self.raiseLateError()
+				if isinstance(asteroids, WorldView):
+					asteroids = asteroids.copy()
+				else:
+					asteroids = list(asteroids)
+				self.seq += 1
+				self.busy = True
+				self.request = (self.seq, asteroids, heading, framesToFire)
+				self.ready.set()
+		if late or not self.waitFor(self.seq, self.deadline):
+			if not late:
+				self.abandoned = True
+			self.missed += 1
+			return self.fallbackCommand()
+
+		(seq, cmd, error) = self.result
+		if error != None:
+			raise error
+		self.lastCmd = cmd
+		return cmd
+
+	def fallbackCommand(self):
+		if self.fallback == "last":
+			return self.lastCmd
+		elif self.fallback == "idle":
+			return (False, 0)
+		return None
+
+	# Latencies of this game's completed calls as a list of (upper bound in
+	# seconds, count)
+	def histogram(self):
+		counts = [0] * len(BUCKETS)
+		with self.lock:
+			latencies = list(self.latencies)
+		for latency in latencies:
+			for i in range(len(BUCKETS)):
+				if latency <= BUCKETS[i]:
+					counts[i] += 1
+					break
+		return list(zip(BUCKETS, counts))
+
+	def formatHistogram(self):
+		parts = []
+		for (bound, count) in self.histogram():
+			if count > 0:
+				parts.append("<=%gms:%d" % (bound * 1000, count))
+		return "missed %d/%d  %s" % (self.missed, self.calls, " ".join(parts))
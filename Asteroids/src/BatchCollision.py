@@ -0,0 +1,169 @@
+# Vectorized versions of solveQuadraticEquation, SecondOrderPoly and
+# MovingObject.collideWithObject.  They take NumPy arrays and solve every
+# equation in one pass instead of building a SecondOrderPoly per pair.
+#
+# Missing roots are NaN.  The branches match solveQuadraticEquation exactly:
+# a == 0 gives the single root -c/b (none when b == 0 too), a zero
+# discriminant gives the single root -b/(2a).
+
+import numpy as np
+
+nan = float("nan")
+
+# The roots of a x^2 + b x + c = 0, in the order solveQuadraticEquation lists
+# them, as two arrays.  r2 is NaN wherever there are fewer than two roots.
+def solveQuadraticEquations(a, b, c):
+	(a, b, c) = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float),
+									np.asarray(c, dtype=float))
+	with np.errstate(divide="ignore", invalid="ignore"):
+		discr = b * b - 4 * a * c
+		root = np.sqrt(discr)
+		r1 = (-b - root) / (2 * a)
+		r2 = (-b + root) / (2 * a)
+		linear = a == 0
+		r1 = np.where(linear, np.where(b == 0, nan, -c / b), r1)
+		r1 = np.where(~linear & (discr < 0), nan, r1)
+		r2 = np.where(linear | (discr <= 0), nan, r2)
+	return (r1, r2)
+
+# Like SecondOrderPoly.smallestPostiveRoot: the first root in list order that
+# is strictly positive, NaN instead of None.
+def smallestPositiveRoots(a, b, c):
+	(r1, r2) = solveQuadraticEquations(a, b, c)
+	return np.where(r1 > 0, r1, np.where(r2 > 0, r2, nan))
+
+# Earliest contact time of every object in A with every object in B, as an
+# N x M matrix.  Objects that already touch get 0 (collideWithObject returns
+# (0,) for them) and pairs that never meet get NaN.
+#
+# posA, velA -- (N, 2) arrays, radA -- N radii; likewise for B.
+#
+# The arithmetic is that of collideWithObject in double precision.
+# MovingObject stores its vectors in Panda's single precision types, so feed
+# it values that are exact in single precision to compare the two bit for
+# bit.
+def collisionTimes(posA, velA, radA, posB, velB, radB):
+	posA = np.asarray(posA, dtype=float)
+	velA = np.asarray(velA, dtype=float)
+	posB = np.asarray(posB, dtype=float)
+	velB = np.asarray(velB, dtype=float)
+	collideDist = np.asarray(radA, dtype=float)[:, None] + np.asarray(radB, dtype=float)[None, :]
+	X = posA[:, None, 0] - posB[None, :, 0]
+	Y = posA[:, None, 1] - posB[None, :, 1]
+	DX = velA[:, None, 0] - velB[None, :, 0]
+	DY = velA[:, None, 1] - velB[None, :, 1]
+	a = DX * DX + DY * DY
+	b = 2 * (X * DX + Y * DY)
+	c = X * X + Y * Y - collideDist * collideDist
+	times = smallestPositiveRoots(a, b, c)
+	return np.where(np.sqrt(X * X + Y * Y) <= collideDist, 0.0, times)
+
+# The start, end and offset arrays, (N, count), of wrapStretches for the
+# coordinates x moving at speeds v, see MovingObject.wrapStretches
+def wrapStretchArrays(x, v, rad, halfSz, dt=None, count=3):
+	speed = np.abs(v)
+	moving = speed > 0
+	with np.errstate(divide="ignore", invalid="ignore"):
+		def after(dist):
+			t = dist / speed
+			if dt:
+				t = np.maximum(np.floor(t / dt) + 1, 1) * dt
+			return np.where(moving, np.maximum(t, 0.0), np.inf)
+		first = after(np.where(v > 0, halfSz + rad - x, x + rad + halfSz))
+		period = after(2 * halfSz + rad)
+		edge = np.where(v > 0, -halfSz, halfSz)
+		k = np.arange(count - 1)[None, :]
+		starts = first[:, None] + k * period[:, None]
+		start = np.column_stack((np.zeros(len(x)), starts))
+		end = np.column_stack((first, starts + period[:, None]))
+		offset = np.column_stack((np.zeros(len(x)), edge[:, None] - (x[:, None] + v[:, None] * starts)))
+		offset = np.where(np.isfinite(start), offset, 0.0)
+	return (start, end, offset)
+
+# Like collisionTimes, but the objects in A wrap around a field of fieldSz
+# and those in B don't: MovingObject.collideWithObjectWrapped for every pair.
+# The 9 images of every object in A are tested against every object in B
+# with a bounding box first, and only the pairs left over are solved.
+def wrappedCollisionTimes(posA, velA, radA, posB, velB, radB, fieldSz, dt=None, horizon=None):
+	posA = np.asarray(posA, dtype=float).reshape(-1, 2)
+	velA = np.asarray(velA, dtype=float).reshape(-1, 2)
+	radA = np.asarray(radA, dtype=float)
+	posB = np.asarray(posB, dtype=float).reshape(-1, 2)
+	velB = np.asarray(velB, dtype=float).reshape(-1, 2)
+	halfSz = fieldSz / 2.0
+	(sx, ex, ox) = wrapStretchArrays(posA[:, 0], velA[:, 0], radA, halfSz, dt)
+	(sy, ey, oy) = wrapStretchArrays(posA[:, 1], velA[:, 1], radA, halfSz, dt)
+
+	# Images (i, j) as (N, 1, 9) arrays, pairs with B as (N, M, 9)
+	def images(xs, ys, combine):
+		return combine(np.repeat(xs, 3, axis=1), np.tile(ys, (1, 3)))[:, None, :]
+	t0 = images(sx, sy, np.maximum)
+	t1 = images(ex, ey, np.minimum)
+	if horizon != None:
+		t1 = np.minimum(t1, horizon)
+	X = images(ox, oy, lambda a, b: a) + posA[:, None, None, 0] - posB[None, :, None, 0]
+	Y = images(ox, oy, lambda a, b: b) + posA[:, None, None, 1] - posB[None, :, None, 1]
+	DX = (velA[:, None, 0] - velB[None, :, 0])[:, :, None]
+	DY = (velA[:, None, 1] - velB[None, :, 1])[:, :, None]
+	reach = (radA[:, None] + np.asarray(radB, dtype=float)[None, :])[:, :, None]
+	(X, Y, DX, DY, reach, t0, t1) = np.broadcast_arrays(X, Y, DX, DY, reach, t0, t1)
+
+	# Bounding box of each image's path over its stretch of time
+	with np.errstate(invalid="ignore"):
+		finite = np.isfinite(t1)
+		end = np.where(finite, t1, t0)
+		(ax, bx) = (X + DX * t0, X + DX * end)
+		(ay, by) = (Y + DY * t0, Y + DY * end)
+		near = (np.minimum(ax, bx) <= reach) & (np.maximum(ax, bx) >= -reach) & \
+			   (np.minimum(ay, by) <= reach) & (np.maximum(ay, by) >= -reach)
+	test = (t0 < t1) & (near | ~finite)
+
+	times = np.full(X.shape, nan)
+	idx = np.nonzero(test)
+	(X, Y, DX, DY, reach, t0, t1) = (v[idx] for v in (X, Y, DX, DY, reach, t0, t1))
+	(X0, Y0) = (X + DX * t0, Y + DY * t0)
+	a = DX * DX + DY * DY
+	b = 2 * (X * DX + Y * DY)
+	c = X * X + Y * Y - reach * reach
+	# Pairs at rest relative to each other have no roots; solve x^2 + 1 = 0
+	moving = a > 0
+	(r1, r2) = solveQuadraticEquations(np.where(moving, a, 1.0), np.where(moving, b, 0.0),
+									   np.where(moving, c, 1.0))
+	with np.errstate(invalid="ignore"):
+		t = np.where((r1 > t0) & (r1 < t1), r1, np.where((r2 > t0) & (r2 < t1), r2, nan))
+	t = np.where(X0 * X0 + Y0 * Y0 <= reach * reach, t0, t)
+	times[idx] = t
+	return np.fmin.reduce(times, axis=2)
+
+# Positions, velocities and radii of a list of MovingObjects as arrays, ready
+# for collisionTimes
+def movingObjectArrays(objs):
+	pos = np.array([(obj.pos[0], obj.pos[1]) for obj in objs], dtype=float).reshape(-1, 2)
+	vel = np.array([(obj.vel[0], obj.vel[1]) for obj in objs], dtype=float).reshape(-1, 2)
+	rad = np.array([obj.rad for obj in objs], dtype=float)
+	return (pos, vel, rad)
+
+def test(A, B, C):
+	from SecondOrderPoly import SecondOrderPoly
+	poly = SecondOrderPoly(A, B, C)
+	(r1, r2) = solveQuadraticEquations(A, B, C)
+	print(poly)
+	print("%s %s" % (poly.realRoots(), [r for r in (float(r1), float(r2)) if r == r]))
+	print("%s %s" % (poly.smallestPostiveRoot(), float(smallestPositiveRoots(A, B, C))))
+
+if __name__ == "__main__":
+	test(1, 2, 3)
+	test(0, 2, 1)
+	test(0, 0, 1)
+	test(3, 2, -1)
+	test(1, 0, 0)
+	test(1, -4, 4)
+	test(1, -4, -5)
+
+	# The examples of MovingObject.py, plus a pair that already touches
+	posA = [(0, 0), (0, 0), (-3, -3), (0, 0)]
+	velA = [(1, 1), (-1, 1), (2, 2), (0, 0)]
+	posB = [(3, 0), (3, 0), (0, 0), (1, 1)]
+	velB = [(0, 1), (1, 1), (1, 1), (0, 0)]
+	times = collisionTimes(posA, velA, [1] * 4, posB, velB, [1] * 4)
+	print(times.diagonal())
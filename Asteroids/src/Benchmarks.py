@@ -0,0 +1,260 @@
+# Micro-benchmarks of the collision and AI hot paths.
+#
+# Every benchmark runs on seeded asteroid fields of each size in SIZES, so
+# the numbers are comparable between runs and between changes:
+#
+#	solveQuadraticEquation             -- the quadratic of each rock vs a bullet
+#	SecondOrderPoly.smallestPostiveRoot
+#	MovingObject.collideWithObject     -- each rock vs a bullet from the ship
+#	MovingObject.collideWithPointAtOrigin
+#	touching                           -- BodyArrays.touching, the ship against the field
+#	ShipAI.getAICommand                -- one call on the whole field
+#	myShipAI.getAICommand
+#
+# For each benchmark and field size the report gives the time per call in
+# nanoseconds and the memory it takes: the peak bytes traced by tracemalloc
+# during a call (peak B) and the blocks it leaves allocated (kept blks).
+# Neither counts allocations; a call that allocates and frees in a loop
+# shows only its peak.  The scaling column is the exponent k in time ~
+# size^k from the previous size, so 0 means a call doesn't depend on the
+# field and 1 means it is linear.
+#
+# --startup measures instead what a process pays before it can play: the
+# import time of each of STARTUP_MODULES in a fresh interpreter, and the
+# time from starting a fresh interpreter, as a worker is started where fork
+# isn't used, to it having built a ShipAI, next to that of an interpreter
+# that does nothing.  The AI modules don't import Panda3D (see Vectors.py),
+# so the AI's share should stay in the low milliseconds.
+#
+# Usage:  python Benchmarks.py [size ...] [--json PATH] [--seconds S] [--scenario PATH]
+#         python Benchmarks.py --startup
+
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from math import log
+import GameConstants
+from BodyArrays import BodyArrays
+from MovingObject import MovingObject
+from SecondOrderPoly import SecondOrderPoly, solveQuadraticEquation
+from Scenario import loadScenario
+from Simulation import createShipAI
+from Vectors import Point2
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+clock = getattr(time, "perf_counter", time.time)
+
+SIZES = [10, 100, 1000, 10000]
+SEED = 12513
+SECONDS = 0.2			# least time spent timing each benchmark and size
+STARTUP_RUNS = 5		# fresh processes per startup measurement, the best one counts
+STARTUP_MODULES = ["Vectors", "SecondOrderPoly", "MovingObject", "ShipAI", "Simulation"]
+
+MY_SHIP_AI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Asteroids", "myShipAI.py")
+
+# A field of n asteroids of random sizes, spawned away from the ship like
+# Simulation.spawnAsteroids does
+def makeField(n, seed=SEED, consts=GameConstants):
+	rng = random.Random(seed)
+	WC_SZ = consts.FIELD_SZ // 2
+	coords = tuple(range(-WC_SZ, -WC_SZ // 2)) + tuple(range(WC_SZ // 2, WC_SZ))
+	field = []
+	for i in range(n):
+		size = rng.randrange(len(consts.AST_DIAMS))
+		pos = Point2(rng.choice(coords), rng.choice(coords))
+		heading = rng.random() * 360
+		field.append(MovingObject(i + 1, pos, heading, consts.AST_SPEEDS[size], consts.AST_DIAMS[size] / 2.0))
+	return field
+
+def fieldArrays(field):
+	bodies = BodyArrays(len(field))
+	for obj in field:
+		bodies.add(obj.id, obj.pos[0], obj.pos[1], obj.vel[0], obj.vel[1], obj.rad)
+	return bodies
+
+# The (a, b, c) of collideWithObject for every rock and a bullet fired at
+# heading 90
+def quadratics(field, consts=GameConstants):
+	bullet = MovingObject(0, Point2(0, 0), 90, consts.BULLET_SPEED, consts.BULLET_RAD)
+	result = []
+	for obj in field:
+		collideDist = obj.rad + bullet.rad
+		(X, Y) = (obj.pos[0] - bullet.pos[0], obj.pos[1] - bullet.pos[1])
+		(DX, DY) = (obj.vel[0] - bullet.vel[0], obj.vel[1] - bullet.vel[1])
+		result.append((DX * DX + DY * DY, 2 * (X * DX + Y * DY), X * X + Y * Y - collideDist * collideDist))
+	return result
+
+def loadMyShipAI():
+	try:
+		import importlib.util
+		spec = importlib.util.spec_from_file_location("myShipAI", MY_SHIP_AI)
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
+	except ImportError:
+		import imp
+		module = imp.load_source("myShipAI", MY_SHIP_AI)
+	return module.myShipAI
+
+# Benchmarks as (name, setup).  setup(field) returns the list of calls to
+# time; one op is one call.
+def perRock(fn):
+	return lambda field: [(lambda obj=obj: fn(obj)) for obj in field]
+
+def aiCall(makeAI):
+	def setup(field):
+		ai = makeAI()
+		ai.newGame()
+		return [lambda: ai.getAICommand(field, 90, 0)]
+	return setup
+
+def benchmarks(consts=GameConstants):
+	c = consts
+	bullet = MovingObject(0, Point2(0, 0), 90, c.BULLET_SPEED, c.BULLET_RAD)
+	return [
+		("solveQuadraticEquation",
+		 lambda field: [(lambda q=q: solveQuadraticEquation(*q)) for q in quadratics(field, c)]),
+		("SecondOrderPoly.smallestPostiveRoot",
+		 lambda field: [SecondOrderPoly(*q).smallestPostiveRoot for q in quadratics(field, c)]),
+		("MovingObject.collideWithObject", perRock(lambda obj: obj.collideWithObject(bullet))),
+		("MovingObject.collideWithPointAtOrigin", perRock(lambda obj: obj.collideWithPointAtOrigin())),
+		("touching", lambda field: [lambda bodies=fieldArrays(field):
+									bodies.touching(bodies.live(), 0.0, 0.0, c.SHIP_RAD)]),
+		("ShipAI.getAICommand", aiCall(lambda: createShipAI(consts=c))),
+		("myShipAI.getAICommand", aiCall(lambda: createShipAI(loadMyShipAI(), c, (c.SHIP_RAD,)))),
+	]
+
+# Seconds per call, cycling through calls until at least seconds have passed
+def timeCalls(calls, seconds=SECONDS):
+	ops = 0
+	start = clock()
+	elapsed = 0.0
+	while elapsed < seconds:
+		for call in calls:
+			call()
+		ops += len(calls)
+		elapsed = clock() - start
+	return elapsed / ops
+
+# (peak bytes during a call, blocks kept after it), averaged over calls
+def memoryUse(calls):
+	if tracemalloc == None or len(calls) == 0:
+		return (None, None)
+	peak = 0
+	blocks = 0
+	tracemalloc.start()
+	try:
+		for call in calls:
+			# Forget earlier allocations, so the traces are those of this call
+			tracemalloc.clear_traces()
+			if hasattr(tracemalloc, "reset_peak"):
+				tracemalloc.reset_peak()
+			call()
+			peak += tracemalloc.get_traced_memory()[1]
+			blocks += len(tracemalloc.take_snapshot().traces)
+	finally:
+		tracemalloc.stop()
+	return (peak / float(len(calls)), blocks / float(len(calls)))
+
+# Runs every benchmark on every field size.  Returns {name: [row per size]}
+# with rows {"size", "ns", "peakBytes", "keptBlocks", "scaling"}, or {"error"} for
+# a benchmark that can't run here (e.g. an AI whose imports are missing).
+def runBenchmarks(sizes=SIZES, seconds=SECONDS, seed=SEED, consts=GameConstants, out=sys.stdout):
+	fields = dict((n, makeField(n, seed, consts)) for n in sizes)
+	results = {}
+	for (name, setup) in benchmarks(consts):
+		rows = []
+		try:
+			for n in sizes:
+				calls = setup(fields[n])
+				# Memory is measured on a sample, tracing is slow
+				(peakBytes, keptBlocks) = memoryUse(calls[:100])
+				ns = timeCalls(calls, seconds) * 1e9
+				scaling = None
+				if len(rows) > 0:
+					scaling = log(ns / rows[-1]["ns"]) / log(float(n) / rows[-1]["size"])
+				rows.append({"size": n, "ns": ns, "peakBytes": peakBytes, "keptBlocks": keptBlocks,
+							 "scaling": scaling})
+				if out:
+					out.write(formatRow(name, rows[-1]) + "\n")
+					out.flush()
+		except Exception as e:
+			rows = {"error": "%s: %s" % (type(e).__name__, e)}
+			if out:
+				out.write("%-38s %s\n" % (name, rows["error"]))
+		results[name] = rows
+	return results
+
+def formatRow(name, row):
+	def optional(value, form):
+		return "-" if value == None else form % value
+	return "%-38s %6d %14.1f %10s %8s %8s" % (name, row["size"], row["ns"],
+											   optional(row["peakBytes"], "%.0f"),
+											   optional(row["keptBlocks"], "%.1f"),
+											   optional(row["scaling"], "%.2f"))
+
+# Seconds to import module in a fresh interpreter, the best of runs
+def importTime(module, runs=STARTUP_RUNS):
+	src = os.path.dirname(os.path.abspath(__file__))
+	code = "import time\nstart = time.time()\nimport %s\nprint(time.time() - start)" % module
+	return min(float(subprocess.check_output([sys.executable, "-c", code], cwd=src))
+			   for i in range(runs))
+
+# Seconds from starting a fresh interpreter, as a tournament worker is
+# started where fork isn't used, to it having built a ShipAI for a new game.
+# Also returns the time of an interpreter that does nothing, for reference.
+def workerStartup(runs=STARTUP_RUNS):
+	src = os.path.dirname(os.path.abspath(__file__))
+	build = "import GameConstants as c\nfrom ShipAI import ShipAI\n" \
+			"ShipAI(c.FIELD_SZ, c.AI_TIME, c.TURN_RATE, c.BULLET_SPEED, c.BULLET_REPEAT, c.BULLET_RAD, " \
+			"c.AST_SPEEDS, c.AST_DIAMS, c.NUM_FRAMES, c.PTS).newGame()"
+	times = []
+	for code in ["pass", build]:
+		best = None
+		for i in range(runs):
+			start = clock()
+			subprocess.check_call([sys.executable, "-c", code], cwd=src)
+			elapsed = clock() - start
+			best = elapsed if best == None else min(best, elapsed)
+		times.append(best)
+	return (times[1], times[0])
+
+def reportStartup(out=sys.stdout):
+	for module in STARTUP_MODULES:
+		out.write("import %-30s %8.1f ms\n" % (module, importTime(module) * 1e3))
+	(worker, interpreter) = workerStartup()
+	out.write("%-37s %8.1f ms\n" % ("python -c pass", interpreter * 1e3))
+	out.write("%-37s %8.1f ms (+%.1f ms)\n" % ("worker with a ShipAI", worker * 1e3, (worker - interpreter) * 1e3))
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	if "--startup" in args:
+		reportStartup()
+		sys.exit(0)
+	path = None
+	seconds = SECONDS
+	if "--json" in args:
+		i = args.index("--json")
+		path = args[i + 1]
+		del args[i:i + 2]
+	if "--seconds" in args:
+		i = args.index("--seconds")
+		seconds = float(args[i + 1])
+		del args[i:i + 2]
+	consts = GameConstants
+	if "--scenario" in args:
+		i = args.index("--scenario")
+		consts = loadScenario(args[i + 1])
+		del args[i:i + 2]
+	sizes = [int(arg) for arg in args] or SIZES
+	print("%-38s %6s %14s %10s %8s %8s" % ("benchmark", "rocks", "ns/op", "peak B", "kept blks", "scaling"))
+	results = runBenchmarks(sizes, seconds, consts=consts)
+	if path != None:
+		with open(path, "w") as f:
+			json.dump({"seed": SEED, "sizes": sizes, "results": results}, f, indent=2, sort_keys=True)
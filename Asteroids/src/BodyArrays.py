@@ -0,0 +1,122 @@
+import copy
+import numpy as np
+
+# Structure-of-arrays store for a set of moving circles (the asteroids or the
+# bullets of a game).  Slot i of every array describes one object; slots are
+# handed out in creation order, so walking the live slots in index order
+# visits the objects in the same order the old per-object lists did.
+#
+# pos, vel -- (capacity, 2) float arrays
+# rad      -- radius
+# size     -- index into AST_DIAMS (unused for bullets)
+# ids      -- the ID the AI sees
+# alive    -- False for free or destroyed slots
+#
+# Only the first count slots are in use; dead slots below count are dropped
+# by compact().
+#
+# fork() makes a copy that shares the arrays, copy on write: the first change
+# through a method of either copy gives it arrays of its own.  Code writing
+# to the arrays directly must call own() first.
+class BodyArrays:
+	ARRAYS = ["pos", "vel", "rad", "size", "ids", "alive"]
+
+	def __init__(self, capacity=16):
+		self.count = 0
+		self.shared = False
+		self.allocate(capacity)
+
+	def allocate(self, capacity):
+		self.pos = np.zeros((capacity, 2))
+		self.vel = np.zeros((capacity, 2))
+		self.rad = np.zeros(capacity)
+		self.size = np.zeros(capacity, dtype=np.int8)
+		self.ids = np.zeros(capacity, dtype=np.int64)
+		self.alive = np.zeros(capacity, dtype=bool)
+
+	def capacity(self):
+		return len(self.rad)
+
+	def clear(self):
+		self.own()
+		self.alive[:self.count] = False
+		self.count = 0
+
+	def fork(self):
+		other = copy.copy(self)
+		self.shared = other.shared = True
+		return other
+
+	# Copies the arrays shared with a fork before they are changed
+	def own(self):
+		if self.shared:
+			for name in self.ARRAYS:
+				setattr(self, name, getattr(self, name).copy())
+			self.shared = False
+
+	def grow(self):
+		old = (self.pos, self.vel, self.rad, self.size, self.ids, self.alive)
+		self.allocate(2 * self.capacity())
+		self.shared = False
+		n = self.count
+		for (new, prev) in zip((self.pos, self.vel, self.rad, self.size, self.ids, self.alive), old):
+			new[:n] = prev[:n]
+
+	# Appends an object and returns its slot
+	def add(self, idNum, x, y, vx, vy, rad, size=0):
+		if self.count == self.capacity():
+			self.grow()
+		self.own()
+		i = self.count
+		self.pos[i] = (x, y)
+		self.vel[i] = (vx, vy)
+		self.rad[i] = rad
+		self.size[i] = size
+		self.ids[i] = idNum
+		self.alive[i] = True
+		self.count += 1
+		return i
+
+	def kill(self, i):
+		self.own()
+		self.alive[i] = False
+
+	# Indices of the live slots, in creation order
+	def live(self):
+		return np.flatnonzero(self.alive[:self.count])
+
+	def numAlive(self):
+		return int(np.count_nonzero(self.alive[:self.count]))
+
+	# Drops dead slots, keeping the live ones in order
+	def compact(self):
+		keep = self.live()
+		n = len(keep)
+		if n == self.count:
+			return
+		self.own()
+		for arr in (self.pos, self.vel, self.rad, self.size, self.ids):
+			arr[:n] = arr[keep]
+		self.alive[:n] = True
+		self.alive[n:self.count] = False
+		self.count = n
+
+	# Moves every object by vel * dt and wraps it around the square field of
+	# half width halfSz, like updatePos in main.py
+	def move(self, dt, halfSz):
+		self.own()
+		n = self.count
+		pos = self.pos[:n]
+		pos += self.vel[:n] * dt
+		rad = self.rad[:n, None]
+		over = pos - rad > halfSz
+		under = ~over & (pos + rad < -halfSz)
+		pos[over] = -halfSz
+		pos[under] = halfSz
+
+	# The slots, out of the given ones, holding a live object that touches
+	# the circle at (x, y) with radius rad
+	def touching(self, slots, x, y, rad):
+		d = self.pos[slots] - (x, y)
+		dist = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1])
+		return slots[self.alive[slots] & (dist <= self.rad[slots] + rad)]
@@ -0,0 +1,108 @@
+# Broad phase collision culling for the simulation.
+#
+# A broad phase is built once a frame from the asteroids (a BodyArrays) and
+# then queried with a circle, e.g. a bullet or the ship.  A query returns the
+# slots, in ascending order, of every asteroid that might touch the circle;
+# only those reach the exact circle test.  Objects added after build() are
+# not known to the broad phase and have to be tested by the caller.
+#
+#   grid  -- toroidal uniform grid (spatial hash), the default
+#   sweep -- sort and sweep along x
+#   brute -- no culling, every live asteroid is a candidate
+
+import numpy as np
+
+# Uniform grid over the square field that wraps at FIELD_SZ/2.  Cells are at
+# least cellSize wide.  A query searches the block of cells within reach of
+# the query point (its radius plus the largest asteroid radius), wrapping
+# around the edges, which is the 3x3 block while the reach fits in a cell.
+class SpatialHash:
+	def __init__(self, fieldSz, cellSize):
+		self.halfSz = fieldSz / 2.0
+		self.numCells = max(1, int(fieldSz // cellSize))
+		self.cellWidth = fieldSz / float(self.numCells)
+		self.blocks = {}
+
+	# Keys of the cells within span cells of every cell, wrapping at the
+	# edges.  Built on first use for each span.
+	def neighbors(self, span):
+		if span not in self.blocks:
+			n = self.numCells
+			block = []
+			for cx in range(n):
+				for cy in range(n):
+					keys = set()
+					for dx in range(-span, span + 1):
+						for dy in range(-span, span + 1):
+							keys.add(((cx + dx) % n) * n + (cy + dy) % n)
+					block.append(sorted(keys))
+			self.blocks[span] = block
+		return self.blocks[span]
+
+	def cellKeys(self, pos):
+		cells = np.floor((pos + self.halfSz) / self.cellWidth).astype(np.int64) % self.numCells
+		return cells[:, 0] * self.numCells + cells[:, 1]
+
+	def build(self, bodies):
+		self.live = bodies.live()
+		keys = self.cellKeys(bodies.pos[self.live])
+		if self.numCells * self.numCells <= np.iinfo(np.int16).max:
+			# lets numpy use a radix sort
+			keys = keys.astype(np.int16)
+		order = np.argsort(keys, kind="stable")
+		self.keys = keys[order]
+		self.slots = self.live[order]
+		self.maxRad = bodies.rad[self.live].max() if len(self.live) > 0 else 0.0
+
+	def query(self, x, y, rad):
+		span = int(np.ceil((rad + self.maxRad) / self.cellWidth))
+		if 2 * span + 1 >= self.numCells:
+			return self.live
+		key = self.cellKeys(np.array([[x, y]]))[0]
+		nbrs = self.neighbors(span)[key]
+		lo = np.searchsorted(self.keys, nbrs, "left").tolist()
+		hi = np.searchsorted(self.keys, nbrs, "right").tolist()
+		parts = [self.slots[lo[i]:hi[i]] for i in range(len(nbrs)) if hi[i] > lo[i]]
+		if len(parts) == 0:
+			return self.slots[:0]
+		return np.sort(np.concatenate(parts))
+
+# Asteroids sorted by x; a query takes the run of asteroids whose x is within
+# reach and keeps those whose y is within reach too.
+class SortAndSweep:
+	def build(self, bodies):
+		live = bodies.live()
+		xs = bodies.pos[live, 0]
+		order = np.argsort(xs, kind="stable")
+		self.xs = xs[order]
+		self.ys = bodies.pos[live[order], 1]
+		self.slots = live[order]
+		self.maxRad = bodies.rad[live].max() if len(live) > 0 else 0.0
+
+	def query(self, x, y, rad):
+		reach = rad + self.maxRad
+		lo = np.searchsorted(self.xs, x - reach, "left")
+		hi = np.searchsorted(self.xs, x + reach, "right")
+		near = np.abs(self.ys[lo:hi] - y) <= reach
+		return np.sort(self.slots[lo:hi][near])
+
+class BruteForce:
+	def build(self, bodies):
+		self.live = bodies.live()
+
+	def query(self, x, y, rad):
+		return self.live
+
+BROAD_PHASES = ["grid", "sweep", "brute"]
+
+# Creates the broad phase called name.  The grid cells are as wide as the
+# radius of the largest asteroid, so a bullet or the ship only has to look
+# at the 3x3 block of cells around it.
+def createBroadPhase(name, consts):
+	if name == "grid":
+		return SpatialHash(consts.FIELD_SZ, max(consts.AST_DIAMS) / 2.0)
+	elif name == "sweep":
+		return SortAndSweep()
+	elif name == "brute":
+		return BruteForce()
+	raise ValueError("unknown broad phase %r, expected one of %s" % (name, BROAD_PHASES))
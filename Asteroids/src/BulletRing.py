@@ -0,0 +1,75 @@
+from math import ceil, sqrt
+import numpy as np
+from BodyArrays import BodyArrays
+
+# Fixed capacity ring buffer of bullets.  It has the arrays of BodyArrays plus
+# the age of every bullet in frames.  A new bullet takes the slot after the
+# previous one, so slots are reused instead of created and destroyed, and
+# the per-frame cost stays bounded however long a game runs.
+#
+# The capacity is the number of bullets that can be alive at once: one every
+# BULLET_REPEAT frames over the lifetime of a bullet.  If a bullet is still
+# alive when its slot comes round again it is dropped, and counted in
+# dropped; with the capacity from bulletCapacity() that never happens.
+class BulletRing(BodyArrays):
+	ARRAYS = BodyArrays.ARRAYS + ["age"]
+
+	def __init__(self, capacity):
+		BodyArrays.__init__(self, capacity)
+		self.age = np.zeros(capacity, dtype=np.int32)
+		self.count = capacity
+		self.head = 0
+		self.dropped = 0
+
+	def clear(self):
+		self.own()
+		self.alive[:] = False
+		self.head = 0
+
+	def grow(self):
+		raise RuntimeError("BulletRing has a fixed capacity")
+
+	def add(self, idNum, x, y, vx, vy, rad, size=0):
+		self.own()
+		i = self.head
+		if self.alive[i]:
+			self.dropped += 1
+		self.head = (i + 1) % self.capacity()
+		self.pos[i] = (x, y)
+		self.vel[i] = (vx, vy)
+		self.rad[i] = rad
+		self.size[i] = size
+		self.ids[i] = idNum
+		self.alive[i] = True
+		self.age[i] = 0
+		return i
+
+	# Indices of the live slots, oldest bullet first
+	def live(self):
+		order = np.roll(np.arange(self.capacity()), -self.head)
+		return order[self.alive[order]]
+
+	def compact(self):
+		pass
+
+	# Ages every bullet by a frame and removes the ones older than life
+	def expire(self, life):
+		self.own()
+		self.age += 1
+		self.alive &= self.age <= life
+
+# Frames a bullet lives: BULLET_LIFE, or the frames it takes to fly BULLET_RANGE,
+# whichever is shorter.  With neither set it is the longest a bullet can stay
+# on the field, which is when it flies diagonally, so only the edge removes it.
+def bulletLife(consts):
+	c = consts
+	step = c.BULLET_SPEED * c.DT
+	life = int(ceil(sqrt(2) * (c.FIELD_SZ / 2.0 + c.BULLET_RAD) / step)) + 1
+	if c.BULLET_LIFE != None:
+		life = min(life, c.BULLET_LIFE)
+	if c.BULLET_RANGE != None:
+		life = min(life, int(ceil(c.BULLET_RANGE / step)))
+	return life
+
+def bulletCapacity(consts):
+	return int(ceil(bulletLife(consts) / float(consts.BULLET_REPEAT))) + 1
@@ -0,0 +1,427 @@
+# Event-driven version of Simulation.
+#
+# Between events the world is known in closed form: an asteroid or a bullet
+# flies in a straight line until it wraps, is hit, splits or runs out.  So
+# instead of moving every object and testing every collision on every frame,
+# EventSimulation keeps each object at the position it had at some frame,
+# its base, and queues the frames at which something can happen:
+#
+#	wraps      -- an asteroid may wrap, from the wrap times of MovingObject
+#	bulletEnds -- a bullet may leave the field, or expires
+#	hitChecks  -- a bullet may touch an asteroid, from the roots of the
+#	              contact quadratic (BatchCollision.solveQuadraticEquations)
+#	shipHits   -- an asteroid may touch the ship
+#
+# A frame with nothing due only updates the ship, the score and the shield.
+# Objects are moved to a frame only when that frame has an event for them or
+# when the AI or the renderer asks for them (snapshot, moveTo).
+#
+# The queued frames are a conservative guess, so an event is a check: it runs
+# the same test as the frame-stepped engine, in the same order, on positions
+# computed for that frame, and is queued again for the next frame if the test
+# fails but the contact window isn't over yet.  A bullet is tested against all
+# asteroids with Simulation.collideBullets, so hits come in the same order and
+# get the same IDs.  Played through step(), every frame is snapshot and every
+# object moves one frame at a time, as in Simulation, so the positions, hits
+# and scores are the same bit for bit.  Played through advance(), objects
+# jump several frames at once and positions may differ in the last bits.
+#
+# An event is tied to the versions of its objects, which change when an
+# asteroid wraps or splits or a bullet slot is reused, and is dropped if they
+# changed.  Asteroid slots are never compacted, so slots stay valid in the
+# queues.
+#
+# Usage:  python EventSimulation.py [--scenario PATH]
+#         plays SEEDS with both engines and compares them
+
+import heapq
+import itertools
+import sys
+import time
+from math import floor
+import numpy as np
+import GameConstants
+from BatchCollision import solveQuadraticEquations
+from Scenario import scenarioArgs, scenarioName
+from ShipAI import ShipAI
+from Simulation import Simulation, createShipAI
+
+# Extra reach, in field units, and extra frames added to a contact window,
+# so rounding never makes a window miss a frame with a contact
+REACH_SLACK = 1e-6
+FRAME_SLACK = 1e-6
+
+# Frames, from 0, at which |d + dv * n| <= reach for every row of the (m, 2)
+# arrays d and dv, as (first, last) arrays.  first is -1 where there is no
+# such frame, last is inf for a window that never ends.
+def contactWindows(d, dv, reach):
+	a = dv[:, 0] * dv[:, 0] + dv[:, 1] * dv[:, 1]
+	b = 2 * (d[:, 0] * dv[:, 0] + d[:, 1] * dv[:, 1])
+	c = d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1] - reach * reach
+	(r1, r2) = solveQuadraticEquations(a, b, c)
+	# A double root comes back as r1 only
+	r2 = np.where(np.isnan(r2), r1, r2)
+	with np.errstate(invalid="ignore"):
+		first = np.maximum(np.ceil(r1 - FRAME_SLACK), 0.0)
+		last = np.floor(r2 + FRAME_SLACK)
+		# Not moving apart: touching for ever or never
+		still = a == 0
+		first = np.where(still, 0.0, first)
+		last = np.where(still, np.inf, last)
+		none = np.where(still, c > 0, ~(last >= first))
+	first = np.where(none, -1, first)
+	return (first, last)
+
+# Frames after the base at which a coordinate x moving at v per frame is
+# first more than rad past the edge, as BodyArrays.move tests it, give or
+# take a frame of rounding.  None if it doesn't move.  One that is past the
+# edge already, e.g. an asteroid near the edge that shrank when it split,
+# wraps on the next frame whichever way it moves.
+def edgeFrames(x, v, rad, halfSz):
+	if x - rad > halfSz or x + rad < -halfSz:
+		return 1
+	if v > 0:
+		return max(int(floor((halfSz + rad - x) / v)) + 1, 1)
+	elif v < 0:
+		return max(int(floor((x + rad + halfSz) / -v)) + 1, 1)
+	return None
+
+class EventSimulation(Simulation):
+	def __init__(self, shipAI, consts=GameConstants, broadPhase="grid"):
+		Simulation.__init__(self, shipAI, consts, broadPhase)
+		self.astBase = np.zeros(0, dtype=np.int64)
+		self.astVersion = np.zeros(0, dtype=np.int64)
+		capacity = self.bullets.capacity()
+		self.bulBase = np.zeros(capacity, dtype=np.int64)
+		self.bulVersion = np.zeros(capacity, dtype=np.int64)
+		self.bulExpiry = np.zeros(capacity, dtype=np.int64)
+		# Frames of the last game that had an event
+		self.eventFrames = 0
+
+	def newGame(self, seed):
+		self.seq = itertools.count()
+		# Queues of (frame, seq, ...); see the schedule* methods
+		self.wraps = []
+		self.bulletEnds = []
+		self.hitChecks = []
+		self.shipHits = []
+		self.changed = []
+		self.eventFrames = 0
+		self.bulVersion += 1
+		Simulation.newGame(self, seed)
+		a = self.asteroids
+		self.growSlots()
+		# Spawned asteroids are where they are before the move of frame 0
+		self.astBase[:a.count] = -1
+		self.astVersion[:a.count] += 1
+		slots = a.live()
+		for i in slots.tolist():
+			self.scheduleWrap(i, 0)
+		self.scheduleShipHits(slots, 0)
+
+	# Unlike Simulation.fork the arrays are copied straight away, the event
+	# engine writes to them in place
+	def fork(self):
+		other = Simulation.fork(self)
+		other.asteroids.own()
+		other.bullets.own()
+		for name in ("astBase", "astVersion", "bulBase", "bulVersion", "bulExpiry"):
+			setattr(other, name, getattr(self, name).copy())
+		for name in ("wraps", "bulletEnds", "hitChecks", "shipHits"):
+			setattr(other, name, list(getattr(self, name)))
+		other.seq = itertools.count(next(self.seq))
+		return other
+
+	# Keeps the per slot arrays as long as the asteroid arrays
+	def growSlots(self):
+		n = self.asteroids.capacity()
+		if len(self.astBase) < n:
+			grow = n - len(self.astBase)
+			self.astBase = np.concatenate((self.astBase, np.zeros(grow, dtype=np.int64)))
+			self.astVersion = np.concatenate((self.astVersion, np.zeros(grow, dtype=np.int64)))
+
+	# Positions of the asteroids in slots at the end of frame, without moving them
+	def asteroidsAt(self, slots, frame):
+		a = self.asteroids
+		steps = (frame - self.astBase[slots]).astype(float)
+		return a.pos[slots] + a.vel[slots] * self.consts.DT * steps[:, None]
+
+	def bulletsAt(self, slots, frame):
+		b = self.bullets
+		steps = (frame - self.bulBase[slots]).astype(float)
+		return b.pos[slots] + b.vel[slots] * self.consts.DT * steps[:, None]
+
+	def moveAsteroids(self, slots, frame):
+		self.asteroids.pos[slots] = self.asteroidsAt(slots, frame)
+		self.astBase[slots] = frame
+
+	def moveBullets(self, slots, frame):
+		self.bullets.pos[slots] = self.bulletsAt(slots, frame)
+		self.bulBase[slots] = frame
+
+	# Moves every live object to where it is at the end of frame, for the AI
+	# or a renderer reading the arrays
+	def moveTo(self, frame):
+		a = self.asteroids
+		live = a.live()
+		moving = live[self.astBase[live] != frame]
+		if len(moving) > 0:
+			self.moveAsteroids(moving, frame)
+		slots = self.bullets.live()
+		self.moveBullets(slots, frame)
+		# Bullet ages aren't kept up frame by frame, see BulletRing.expire
+		self.bullets.age[slots] = frame - (self.bulExpiry[slots] - self.bulletLife) + 1
+
+	def snapshot(self):
+		self.moveTo(self.currFrame - 1)
+		return Simulation.snapshot(self)
+
+	# The frame of the next queued event, None if there is none
+	def nextEvent(self):
+		frames = [queue[0][0] for queue in (self.wraps, self.bulletEnds, self.hitChecks, self.shipHits) if queue]
+		return min(frames) if frames else None
+
+	# Takes the events queued for frame or earlier off queue
+	def due(self, queue, frame):
+		result = []
+		while queue and queue[0][0] <= frame:
+			result.append(heapq.heappop(queue))
+		return result
+
+	def scheduleWrap(self, i, fromFrame):
+		a = self.asteroids
+		halfSz = self.consts.FIELD_SZ / 2.0
+		step = a.vel[i] * self.consts.DT
+		frames = [n for n in (edgeFrames(a.pos[i, 0], step[0], a.rad[i], halfSz),
+							  edgeFrames(a.pos[i, 1], step[1], a.rad[i], halfSz)) if n != None]
+		if len(frames) > 0:
+			frame = max(int(self.astBase[i]) + min(frames) - 1, fromFrame)
+			heapq.heappush(self.wraps, (frame, next(self.seq), i, int(self.astVersion[i])))
+
+	# Queues the first frame from fromFrame on at which each of the asteroids
+	# in slots may touch the ship
+	def scheduleShipHits(self, slots, fromFrame):
+		if len(slots) == 0:
+			return
+		a = self.asteroids
+		d = self.asteroidsAt(slots, fromFrame)
+		(first, last) = contactWindows(d, a.vel[slots] * self.consts.DT,
+									   a.rad[slots] + self.consts.SHIP_RAD + REACH_SLACK)
+		for (i, n, end) in zip(slots.tolist(), first.tolist(), last.tolist()):
+			if n >= 0:
+				heapq.heappush(self.shipHits, (fromFrame + int(n), next(self.seq), i, int(self.astVersion[i]),
+											   fromFrame + end))
+
+	# Queues the first frame from fromFrame on at which each pair of bullet
+	# and asteroid may touch
+	def scheduleHits(self, bulletSlots, asteroidSlots, fromFrame):
+		if len(bulletSlots) == 0 or len(asteroidSlots) == 0:
+			return
+		a = self.asteroids
+		b = self.bullets
+		(s, i) = [grid.ravel() for grid in np.meshgrid(bulletSlots, asteroidSlots, indexing="ij")]
+		d = self.asteroidsAt(i, fromFrame) - self.bulletsAt(s, fromFrame)
+		dv = (a.vel[i] - b.vel[s]) * self.consts.DT
+		(first, last) = contactWindows(d, dv, a.rad[i] + b.rad[s] + REACH_SLACK)
+		found = first >= 0
+		for (s, i, n, end) in zip(s[found].tolist(), i[found].tolist(), first[found].tolist(), last[found].tolist()):
+			if fromFrame + n < self.bulExpiry[s]:
+				heapq.heappush(self.hitChecks, (fromFrame + int(n), next(self.seq), s, int(self.bulVersion[s]),
+										   i, int(self.astVersion[i]), fromFrame + end))
+
+	# Everything queued for asteroid i after it changed in frame; a hit test
+	# for frame itself is still to come unless it changed in the hit tests
+	def scheduleAsteroid(self, i, frame, afterHits=False):
+		self.scheduleWrap(i, frame + 1)
+		self.scheduleShipHits(np.array([i]), frame)
+		self.scheduleHits(self.bullets.live(), np.array([i]), frame + 1 if afterHits else frame)
+
+	def asteroidValid(self, i, version):
+		return self.asteroids.alive[i] and self.astVersion[i] == version
+
+	def bulletValid(self, s, version):
+		return self.bullets.alive[s] and self.bulVersion[s] == version
+
+	def fire(self):
+		Simulation.fire(self)
+		b = self.bullets
+		s = (b.head - 1) % b.capacity()
+		frame = self.currFrame
+		# Fired at the ship before the move of this frame
+		self.bulBase[s] = frame - 1
+		self.bulVersion[s] += 1
+		self.bulExpiry[s] = frame + self.bulletLife
+		halfSz = self.consts.FIELD_SZ / 2.0
+		step = b.vel[s] * self.consts.DT
+		end = int(self.bulExpiry[s])
+		for n in (edgeFrames(0.0, step[0], b.rad[s], halfSz), edgeFrames(0.0, step[1], b.rad[s], halfSz)):
+			if n != None:
+				end = min(end, max(frame - 1 + n - 1, frame))
+		heapq.heappush(self.bulletEnds, (end, next(self.seq), s, int(self.bulVersion[s])))
+		self.scheduleHits(np.array([s]), self.asteroids.live(), frame)
+
+	def asteroidHit(self, i):
+		a = self.asteroids
+		count = a.count
+		Simulation.asteroidHit(self, i)
+		self.astVersion[i] += 1
+		if a.alive[i]:
+			self.growSlots()
+			self.astBase[count] = self.currFrame
+			self.astVersion[count] += 1
+			self.changed += [i, count]
+
+	# The asteroid in slot i wraps if it is past the edge at the end of frame,
+	# like BodyArrays.move
+	def wrapAsteroid(self, i, frame):
+		a = self.asteroids
+		halfSz = self.consts.FIELD_SZ / 2.0
+		self.moveAsteroids(np.array([i]), frame)
+		pos = a.pos[i]
+		over = pos - a.rad[i] > halfSz
+		under = ~over & (pos + a.rad[i] < -halfSz)
+		if not (over.any() or under.any()):
+			self.scheduleWrap(i, frame + 1)
+			return
+		pos[over] = -halfSz
+		pos[under] = halfSz
+		self.astVersion[i] += 1
+		self.scheduleAsteroid(i, frame)
+
+	# The bullet in slot s is removed at the end of frame if it expired or
+	# left the field, as in step 4 of Simulation.playFrame
+	def endBullet(self, s, frame):
+		b = self.bullets
+		if frame >= self.bulExpiry[s]:
+			b.kill(s)
+			return
+		halfSz = self.consts.FIELD_SZ / 2.0
+		self.moveBullets(np.array([s]), frame)
+		pos = b.pos[s]
+		if (np.abs(pos) - b.rad[s] > halfSz).any() or (np.abs(pos) == halfSz).any():
+			b.kill(s)
+		else:
+			heapq.heappush(self.bulletEnds, (frame + 1, next(self.seq), s, int(self.bulVersion[s])))
+
+	def playFrame(self, cmd):
+		c = self.consts
+		prof = self.profiler
+		frame = self.currFrame
+		events = False
+		if self.recorder:
+			self.moveTo(frame - 1)
+			self.recorder.frame(self, cmd)
+
+		if cmd == None:
+			if not self.shieldUsed:
+				self.shieldUsed = True
+				self.shieldFrames = c.SHIELD_LIFE
+				self.shieldActive = True
+			cmd = (False, 0)
+
+		#2 Perform ship's command
+		self.updateShip(cmd[0], cmd[1])
+		if prof:
+			prof.mark(2)
+
+		#3 Wrap the asteroids due to
+		for (n, seq, i, version) in self.due(self.wraps, frame):
+			if self.asteroidValid(i, version):
+				self.wrapAsteroid(i, frame)
+				events = True
+		if prof:
+			prof.mark(3)
+
+		#4 Remove the bullets due to
+		for (n, seq, s, version) in self.due(self.bulletEnds, frame):
+			if self.bulletValid(s, version):
+				self.endBullet(s, frame)
+				events = True
+		if prof:
+			prof.mark(4)
+
+		#5 Check bullet collision with asteroids, if any pair may touch
+		a = self.asteroids
+		b = self.bullets
+		self.pairTests = 0
+		pairs = [event for event in self.due(self.hitChecks, frame)
+				 if self.bulletValid(event[2], event[3]) and self.asteroidValid(event[4], event[5])]
+		if len(pairs) > 0:
+			events = True
+			self.moveTo(frame)
+			self.changed = []
+			self.collideBullets()
+			for i in self.changed:
+				self.scheduleAsteroid(i, frame, True)
+			for (n, seq, s, bulletVersion, i, version, last) in pairs:
+				if frame < last and self.bulletValid(s, bulletVersion) and self.asteroidValid(i, version):
+					heapq.heappush(self.hitChecks, (frame + 1, next(self.seq), s, bulletVersion, i, version, last))
+		if prof:
+			prof.mark(5)
+
+		#6 Update score
+		self.gameScore = self.hits[0] * c.PTS[0] + \
+						self.hits[1] * c.PTS[1] + \
+						self.hits[2] * c.PTS[2] - \
+						self.hits[3] * c.PTS[3]
+		if prof:
+			prof.mark(6)
+
+		#7 Check if game is over:
+		#  A. maximum number of frames processed
+		#  B. Check is ship collided with asteroid, if any may touch it
+		over = frame == c.NUM_FRAMES
+		if not over:
+			threats = [event for event in self.due(self.shipHits, frame) if self.asteroidValid(event[2], event[3])]
+			if self.shieldActive:
+				self.shieldFrames -= 1
+				if self.shieldFrames == 0:
+					self.shieldActive = False
+			elif len(threats) > 0:
+				events = True
+				slots = np.array([event[2] for event in threats])
+				self.moveAsteroids(slots, frame)
+				self.pairTests += len(slots)
+				over = len(a.touching(slots, 0.0, 0.0, c.SHIP_RAD)) > 0
+			for (n, seq, i, version, last) in threats:
+				if frame < last:
+					heapq.heappush(self.shipHits, (frame + 1, next(self.seq), i, version, last))
+
+		if events:
+			self.eventFrames += 1
+		if prof:
+			prof.mark(7)
+			prof.endFrame(frame, a.numAlive(), b.numAlive(), self.pairTests)
+		if over:
+			self.alive = False
+			return False
+		self.currFrame += 1
+		return True
+
+# Plays every seed with both engines; returns [(seed, frame score, event
+# score, frame hits, event hits)] and the seconds each engine took
+def compareEngines(aiClass=ShipAI, seeds=None, consts=GameConstants, extraArgs=()):
+	if seeds == None:
+		seeds = consts.SEEDS
+	engines = [Simulation(createShipAI(aiClass, consts, extraArgs), consts),
+			   EventSimulation(createShipAI(aiClass, consts, extraArgs), consts)]
+	results = [[], []]
+	seconds = [0.0, 0.0]
+	for seed in seeds:
+		for (k, sim) in enumerate(engines):
+			startTime = time.time()
+			sim.run(seed)
+			seconds[k] += time.time() - startTime
+			results[k].append((sim.gameScore, list(sim.hits), sim.currFrame))
+	rows = [(seed, old[0], new[0], old[1], new[1]) for (seed, old, new) in zip(seeds, results[0], results[1])]
+	return (rows, seconds)
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	for consts in scenarioArgs(args):
+		(rows, seconds) = compareEngines(consts=consts)
+		print("Scenario " + scenarioName(consts))
+		for (seed, old, new, oldHits, newHits) in rows:
+			print("seed %-8d score %4d  event engine %4d  %s" % (seed, old, new, "" if oldHits == newHits else
+																   "MISMATCH %s %s" % (oldHits, newHits)))
+		print("Frame engine %.2f seconds, event engine %.2f seconds" % tuple(seconds))
@@ -0,0 +1,137 @@
+# Firing solutions for every heading the ship can reach.
+#
+# The ship sits at the origin, starts at heading 90 and turns in steps of
+# turnRate degrees, so with TURN_RATE = 4 it can only ever face the 90
+# headings 2, 6, ..., 358.  The bullet velocity for each of them is computed
+# once, when the table is built.  Every frame solve() then tests every
+# asteroid against every heading in one batch, taking into account the
+# frames needed to turn there and the frames left before the gun is ready.
+#
+# Like MovingObject.collideWithObject, the solutions ignore wrapping.
+# A hit only counts if it happens inside the field, since bullets that reach
+# the edge are removed.
+#
+# Typical use in an AI:
+#
+#	self.firingTable = FiringTable(turnRate, bulletSpeed, bulletRad, dt, fieldSz)
+#	...
+#	solution = self.firingTable.solveObjects(asteroids, heading, framesToFire)
+#	(h, i, t) = solution.earliest()
+#	if h != None: return solution.command(h)
+
+import numpy as np
+from math import radians, cos, sin
+from BatchCollision import smallestPositiveRoots, movingObjectArrays
+
+class FiringTable:
+	# maxTurn is the largest turnDir the AI will return, i.e. how many
+	# turnRate steps one frame of turning covers.
+	def __init__(self, turnRate, bulletSpeed, bulletRad, dt, fieldSz, startHeading=90, maxTurn=1):
+		self.turnRate = turnRate
+		self.bulletRad = bulletRad
+		self.dt = dt
+		self.halfSz = fieldSz / 2.0
+		self.maxTurn = maxTurn
+		self.numHeadings = int(round(360.0 / turnRate))
+		self.headings = [(startHeading + i * turnRate) % 360 for i in range(self.numHeadings)]
+		# Same arithmetic as fire() in main.py
+		self.bulletVel = np.array([(cos(radians(h)) * bulletSpeed, sin(radians(h)) * bulletSpeed)
+								   for h in self.headings])
+		self.start = self.headings[0]
+
+	# Index of the table heading closest to heading (degrees)
+	def index(self, heading):
+		return int(round((heading - self.start) / float(self.turnRate))) % self.numHeadings
+
+	# Frames of turning needed to get from heading index i to every heading,
+	# turning whichever way is shorter
+	def turnFrames(self, i):
+		steps = np.abs(np.arange(self.numHeadings) - i)
+		steps = np.minimum(steps, self.numHeadings - steps)
+		return -(-steps // self.maxTurn)
+
+	def solveObjects(self, asteroids, heading, framesToFire):
+		(pos, vel, rad) = movingObjectArrays(asteroids)
+		return self.solve(pos, vel, rad, heading, framesToFire)
+
+	# Firing solutions for the asteroids given as (N, 2) positions and
+	# velocities and N radii, seen from a ship at heading with framesToFire
+	# frames before the next shot
+	def solve(self, pos, vel, rad, heading, framesToFire):
+		current = self.index(heading)
+		turns = self.turnFrames(current)
+		# Turning frames also count down framesToFire, so the shot at heading h
+		# goes off after max(turns, framesToFire) frames
+		wait = np.maximum(turns, max(framesToFire, 0))
+
+		# Asteroid positions when each shot is fired: (N, H, 2)
+		pos = np.asarray(pos, dtype=float).reshape(-1, 2)
+		vel = np.asarray(vel, dtype=float).reshape(-1, 2)
+		shotPos = pos[:, None, :] + vel[:, None, :] * (wait * self.dt)[None, :, None]
+		collideDist = np.asarray(rad, dtype=float)[:, None] + self.bulletRad
+
+		# Asteroid relative to the bullet, from the moment it is fired
+		X = shotPos[:, :, 0]
+		Y = shotPos[:, :, 1]
+		DX = vel[:, None, 0] - self.bulletVel[None, :, 0]
+		DY = vel[:, None, 1] - self.bulletVel[None, :, 1]
+		a = DX * DX + DY * DY
+		b = 2 * (X * DX + Y * DY)
+		c = X * X + Y * Y - collideDist * collideDist
+		flight = smallestPositiveRoots(a, b, c)
+		flight = np.where(np.sqrt(X * X + Y * Y) <= collideDist, 0.0, flight)
+
+		# The bullet has to still be on the field when it hits
+		with np.errstate(invalid="ignore"):
+			hitPos = np.abs(flight[:, :, None] * self.bulletVel[None, :, :])
+			onField = (hitPos <= self.halfSz + self.bulletRad).all(axis=2)
+		flight = np.where(onField, flight, np.nan)
+		return FiringSolution(self, current, turns, wait, flight)
+
+# The answer of FiringTable.solve for one frame.  For asteroid i and heading
+# index h:
+#
+#	flight[i, h] -- time from the shot to the hit, NaN if the shot misses
+#	times[i, h]  -- time from now to the hit
+#	turns[h]     -- frames of turning needed to face heading h
+#	wait[h]      -- frames until the shot at heading h goes off
+class FiringSolution:
+	def __init__(self, table, current, turns, wait, flight):
+		self.table = table
+		self.current = current
+		self.turns = turns
+		self.wait = wait
+		self.flight = flight
+		self.times = flight + (wait * table.dt)[None, :]
+
+	def heading(self, h):
+		return self.table.headings[h]
+
+	# The asteroids that a shot at heading index h hits, as a list of
+	# (asteroid index, time from now) sorted by time
+	def targets(self, h):
+		hits = np.flatnonzero(~np.isnan(self.times[:, h]))
+		return sorted(zip(hits.tolist(), self.times[hits, h].tolist()), key=lambda hit: hit[1])
+
+	# Heading indices from which asteroid i can be hit
+	def headingsFor(self, i):
+		return np.flatnonzero(~np.isnan(self.times[i])).tolist()
+
+	# (heading index, asteroid index, time from now) of the earliest hit
+	# available, or (None, None, None)
+	def earliest(self):
+		if self.times.size == 0 or np.isnan(self.times).all():
+			return (None, None, None)
+		(i, h) = np.unravel_index(np.nanargmin(self.times), self.times.shape)
+		return (int(h), int(i), float(self.times[i, h]))
+
+	# The (fire, turnDir) command that works toward shooting from heading
+	# index h: turn the shorter way, then fire once facing it
+	def command(self, h):
+		n = self.table.numHeadings
+		steps = (h - self.current) % n
+		if steps == 0:
+			return (True, 0)
+		if steps <= n - steps:
+			return (False, min(steps, self.table.maxTurn))
+		return (False, -min(n - steps, self.table.maxTurn))
@@ -0,0 +1,118 @@
+# Per-phase frame timing for Simulation.
+#
+# Attach a FrameProfiler to a Simulation (sim.profiler = FrameProfiler()) and
+# every frame records the time spent in each of the numbered phases of a
+# frame, plus the number of asteroids, bullets and exact pair tests.  The
+# records can be summarised per game or over a whole tournament as
+# p50/p95/p99/max reports and written out as JSON or CSV.
+#
+# With pstats=True every phase is also timed by a PStatCollector, so the
+# phases show up in Panda3D's PStats tool when running in the window.  A
+# phase is only known when it ends, so its collector is started and stopped
+# then, as of the times on the PStats clock the phase began and ended.
+
+import csv
+import json
+import time
+import numpy as np
+
+# High resolution monotonic clock (Python 3), time.time otherwise
+clock = getattr(time, "perf_counter", time.time)
+
+PHASES = ["snapshot", "ai", "ship", "asteroids", "bullets", "collisions", "score", "end"]
+COUNTS = ["numAsteroids", "numBullets", "pairTests"]
+PERCENTILES = [50, 95, 99]
+
+class FrameProfiler:
+	def __init__(self, pstats=False):
+		# One row per frame: [game, frame, seconds per phase..., counts...]
+		self.rows = []
+		self.game = 0
+		self.times = [0.0] * len(PHASES)
+		self.collectors = None
+		if pstats:
+			from panda3d.core import PStatClient, PStatCollector
+			self.collectors = [PStatCollector("Simulation:" + phase) for phase in PHASES]
+			self.pstats = PStatClient.getGlobalPstats()
+
+	# Labels the frames that follow; Simulation uses the game's seed
+	def newGame(self, game):
+		self.game = game
+
+	def beginFrame(self):
+		self.times = [0.0] * len(PHASES)
+		self.last = clock()
+		if self.collectors:
+			self.pstatsLast = self.pstats.getRealTime()
+
+	# Ends the current phase.  Phases that are skipped, e.g. the snapshot
+	# and the AI when a command is given to Simulation.advance directly,
+	# keep a time of 0.
+	def mark(self, phase):
+		now = clock()
+		self.times[phase] += now - self.last
+		self.last = now
+		if self.collectors:
+			now = self.pstats.getRealTime()
+			thread = self.pstats.getCurrentThread()
+			self.collectors[phase].start(thread, self.pstatsLast)
+			self.collectors[phase].stop(thread, now)
+			self.pstatsLast = now
+
+	def endFrame(self, frame, asteroids, bullets, pairTests):
+		self.rows.append([self.game, frame] + self.times + [asteroids, bullets, pairTests])
+
+	def extend(self, rows):
+		self.rows.extend(rows)
+
+	def frames(self, game=None):
+		if game == None:
+			return self.rows
+		return [row for row in self.rows if row[0] == game]
+
+	# p50/p95/p99/max of every phase, in microseconds, and of the counts, for
+	# one game or for all frames recorded
+	def report(self, game=None):
+		rows = self.frames(game)
+		result = {"frames": len(rows), "phases": {}, "counts": {}}
+		if len(rows) == 0:
+			return result
+		data = np.array([row[2:] for row in rows], dtype=float)
+		data[:, :len(PHASES)] *= 1e6
+		data = np.column_stack((data[:, :len(PHASES)].sum(axis=1), data))
+		names = ["frame"] + PHASES + COUNTS
+		for i in range(len(names)):
+			stats = {}
+			for p in PERCENTILES:
+				stats["p%d" % p] = float(np.percentile(data[:, i], p))
+			stats["max"] = float(data[:, i].max())
+			stats["mean"] = float(data[:, i].mean())
+			if i <= len(PHASES):
+				result["phases"][names[i]] = stats
+			else:
+				result["counts"][names[i]] = stats
+		return result
+
+	def formatReport(self, game=None):
+		report = self.report(game)
+		lines = ["%-12s %10s %10s %10s %10s  (us, %d frames)" % ("phase", "p50", "p95", "p99", "max", report["frames"])]
+		for (section, table) in (("phases", ["frame"] + PHASES), ("counts", COUNTS)):
+			for name in table:
+				if name in report[section]:
+					s = report[section][name]
+					lines.append("%-12s %10.1f %10.1f %10.1f %10.1f" % (name, s["p50"], s["p95"], s["p99"], s["max"]))
+		return "\n".join(lines)
+
+	def writeJSON(self, path, game=None):
+		report = self.report(game)
+		if game == None:
+			report["games"] = dict((str(g), self.report(g)) for g in sorted(set(row[0] for row in self.rows)))
+		with open(path, "w") as f:
+			json.dump(report, f, indent=2, sort_keys=True)
+
+	# Every frame as a row: game, frame, seconds per phase, counts
+	def writeCSV(self, path):
+		with open(path, "w") as f:
+			out = csv.writer(f)
+			out.writerow(["game", "frame"] + PHASES + COUNTS)
+			out.writerows(self.rows)
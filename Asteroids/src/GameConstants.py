@@ -0,0 +1,39 @@
+# Game constants shared by the Panda3D window (main.py) and the headless
+# simulation (Simulation.py).
+
+SEEDS = [12513,2234,23,3,4342,          # 20 random seeds, to ensure 20 repeatable
+         954,233,786,4545423,1121,      # games.
+         3426,976443,20452,503,2237,
+         67121,36767,743,212,7524]
+
+NUM_GAMES = len(SEEDS)
+
+FIELD_SZ = 700					# dimensions of square window
+NUM_FRAMES = 2000				# number of frames in a game
+DT = 0.05						# seconds [virtual] for each frame
+AI_TIME = 0.05					# time allowed for AI
+AI_FALLBACK = "last"			# command when the AI misses AI_TIME: "last", "idle" or "shield"
+
+INIT_NUM_ASTEROIDS = 10			# number of asteroids to start game
+
+TURN_RATE = 4					# degrees in one turn
+
+BULLET_REPEAT = 8				# frames to wait between firings
+BULLET_SPEED = 200				# speed of fired bullet
+BULLET_RAD = 2					# radius of bullet
+BULLET_LIFE = None				# frames a bullet lives, None for until it leaves the field
+BULLET_RANGE = None				# distance a bullet flies, None for until it leaves the field
+
+INIT_AST_SPEED = 100
+AST_SPEED_FACTOR = 1.5
+
+INIT_AST_RAD = 80
+AST_SZ_FACTOR = 0.5
+
+SHIP_RAD = 8					# radius of ship
+SHIELD_LIFE = 200				# frames of immunity
+PTS = [2, 4, 10, -1]			# points for L, M, S, shots
+
+# Computed constant quantities, don't change
+AST_DIAMS = [2*INIT_AST_RAD, 2*int(INIT_AST_RAD*AST_SZ_FACTOR), 2*int(INIT_AST_RAD*AST_SZ_FACTOR*AST_SZ_FACTOR)]
+AST_SPEEDS = [INIT_AST_SPEED, int(INIT_AST_SPEED*AST_SPEED_FACTOR), int(INIT_AST_SPEED*AST_SPEED_FACTOR*AST_SPEED_FACTOR)]
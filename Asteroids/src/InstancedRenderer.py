@@ -0,0 +1,92 @@
+# Hardware instanced drawing of the asteroids and bullets.
+#
+# Instead of one textured plane NodePath per object, every kind of object
+# (circle.png for the asteroids, bullet.png for the bullets) is a single
+# plane drawn with instancing.  The position and size of each instance come
+# from a buffer texture that is refilled from the simulation's arrays every
+# frame, so the cost of drawing depends on the number of kinds, not on the
+# number of objects.
+#
+# Needs a driver with OpenGL 3.1 (buffer textures and gl_InstanceID).
+
+import numpy as np
+from panda3d.core import Shader, Texture, GeomEnums, OmniBoundingVolume, TransparencyAttrib
+
+# The plane model lies in its x-z plane.  The shader lays it onto the x-y
+# plane, as setP(-90) does in loadObject, then moves and scales it by the
+# instance's (x, y, diameter).
+VERTEX_SHADER = """
+#version 140
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform samplerBuffer instances;
+in vec4 p3d_Vertex;
+in vec2 p3d_MultiTexCoord0;
+out vec2 texcoord;
+
+void main() {
+	vec4 inst = texelFetch(instances, gl_InstanceID);
+	vec4 pos = vec4(inst.x + p3d_Vertex.x * inst.z, inst.y + p3d_Vertex.z * inst.z, 0, 1);
+	gl_Position = p3d_ModelViewProjectionMatrix * pos;
+	texcoord = p3d_MultiTexCoord0;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 140
+uniform sampler2D p3d_Texture0;
+in vec2 texcoord;
+out vec4 color;
+
+void main() {
+	color = texture(p3d_Texture0, texcoord);
+}
+"""
+
+# One instanced plane for one kind of object
+class InstancedLayer:
+	def __init__(self, plane, parent, texture, capacity=64):
+		self.node = plane.copyTo(parent)
+		self.node.setShader(Shader.make(Shader.SL_GLSL, VERTEX_SHADER, FRAGMENT_SHADER))
+		self.node.setTexture(texture, 1)
+		self.node.setBin("unsorted", 0)
+		self.node.setDepthTest(False)
+		self.node.setTransparency(TransparencyAttrib.MAlpha)
+		# The instances are placed by the shader, so Panda can't cull them
+		self.node.node().setBounds(OmniBoundingVolume())
+		self.node.node().setFinal(True)
+		self.allocate(capacity)
+		self.node.setInstanceCount(0)
+
+	def allocate(self, capacity):
+		self.capacity = capacity
+		self.buffer = Texture("instances")
+		self.buffer.setupBufferTexture(capacity, Texture.T_float, Texture.F_rgba32, GeomEnums.UH_dynamic)
+		self.data = np.zeros((capacity, 4), dtype=np.float32)
+		self.node.setShaderInput("instances", self.buffer)
+
+	# Draws one instance per row of pos, an (n, 2) array, with the given
+	# diameters
+	def update(self, pos, diams):
+		n = len(pos)
+		if n > self.capacity:
+			self.allocate(max(n, 2 * self.capacity))
+		self.data[:n, 0:2] = pos
+		self.data[:n, 2] = diams
+		self.buffer.setRamImage(self.data.tobytes())
+		self.node.setInstanceCount(n)
+
+# Draws the asteroids and bullets of a Simulation with one instanced plane
+# each
+class InstancedRenderer:
+	def __init__(self, plane, parent, asteroidTexture, bulletTexture):
+		self.asteroids = InstancedLayer(plane, parent, asteroidTexture)
+		self.bullets = InstancedLayer(plane, parent, bulletTexture)
+
+	def sync(self, game):
+		for (layer, bodies) in ((self.asteroids, game.asteroids), (self.bullets, game.bullets)):
+			live = bodies.live()
+			layer.update(bodies.pos[live], 2 * bodies.rad[live])
+
+	def clear(self):
+		self.asteroids.node.setInstanceCount(0)
+		self.bullets.node.setInstanceCount(0)
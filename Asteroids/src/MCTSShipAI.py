@@ -0,0 +1,309 @@
+# A ship AI that plans with Monte Carlo tree search.
+#
+# Every frame it searches the tree of commands from the current position
+# until its time (a fraction of AI_TIME) is up, then returns the most tried
+# command of the root, so it always answers in time with the best move found
+# so far.  The tree actions are
+#
+#	fire         -- (True, 0)
+#	left, right  -- (False, 1) and (False, -1), i.e. turn by TURN_RATE
+#	shield       -- None, only at the root and only while it is unused
+#
+# The shield lasts longer than any rollout, so it would always look safest.
+# It is only played when none of the rollouts of the other moves lived.
+#
+# The game is deterministic, so the subtree of the command played is the
+# tree of the next frame and the search goes on from there instead of
+# starting over.
+#
+# The forward model is a VectorEnv: a batch of paths is picked down the tree
+# (UCT, with a virtual visit for every path already picked in the batch),
+# every row of the VectorEnv is loaded with the current position, and the
+# rows are stepped together, first with the actions of their path and then
+# with random ones, up to rolloutFrames frames ahead.  The value of a path
+# is the score it made, plus aliveBonus if the ship is still alive at the
+# end.  So a batch of rollouts costs rolloutFrames array steps whatever its
+# size.
+#
+# The position comes from a Simulation that is kept in step with the game:
+# the AI only sees the asteroids, heading and framesToFire, so the bullets
+# in flight and the shield are those of the model.  Each call first plays
+# the last frame in the model with the command the game played.  That is
+# the one returned, unless the AI missed its deadline under an AIWatchdog
+# and the game played a fallback; the new heading and framesToFire tell
+# which, except for a shield raised instead of idling, and a fallback is
+# counted as missed.  If the model's asteroids then differ from those
+# handed in, e.g. when more than one frame went by, the model is stale: it
+# is counted and the search starts a new tree from the position as far as
+# the AI can see it.
+#
+# Usage:  python MCTSShipAI.py [N] [--scenario PATH]
+#         plays the first N (default 3) games of SEEDS and prints the score
+#         and rollouts per second of each, next to ShipAI's score
+
+import math
+import random
+import sys
+import time
+import numpy as np
+import GameConstants
+from Replay import NoAI
+from Scenario import Scenario, scenarioArgs, scenarioName
+from ShipAI import ShipAI
+from Simulation import Simulation, createShipAI
+from VectorEnv import VectorEnv, ACTIONS, SHIELD
+from WorldView import NULL_VIEW
+
+clock = getattr(time, "perf_counter", time.time)
+
+# The tree actions, as indices into ACTIONS
+FIRE = ACTIONS.index((True, 0))
+LEFT = ACTIONS.index((False, 1))
+RIGHT = ACTIONS.index((False, -1))
+MOVES = [FIRE, LEFT, RIGHT]
+# Played at random after a path: fire when the gun is ready, else turn
+ROLLOUT_ACTIONS = np.array([ACTIONS.index(cmd) for cmd in [(True, 0), (True, 1), (True, -1)]])
+# How far, in field units, a predicted asteroid may be from the real one
+SYNC_TOLERANCE = 1e-6
+
+class Node(object):
+	__slots__ = ["children", "visits", "value", "survived"]
+
+	def __init__(self):
+		# {action: Node} of the actions tried so far
+		self.children = {}
+		self.visits = 0
+		self.value = 0.0
+		# Rollouts through the node the ship lived through
+		self.survived = 0
+
+class MCTSShipAI:
+	# shipRad is not handed to AIs by AsteroidsDemo, so it is an extra
+	# argument.  timeFraction of dt (AI_TIME) is spent searching.
+	def __init__(self, fieldSz, dt, turnRate, bulletSpeed, bulletRepeat, bulletRad, astSpeeds, astDiams,
+					totalFrames, points, shipRad=GameConstants.SHIP_RAD, timeFraction=0.8, batchSize=32,
+					rolloutFrames=30, aliveBonus=200.0, exploration=25.0, seed=1):
+		# The AI is only told dt, the time it has, which AsteroidsDemo keeps
+		# equal to the frame time
+		self.consts = Scenario("mcts", FIELD_SZ=fieldSz, DT=dt, AI_TIME=dt, TURN_RATE=turnRate,
+							   BULLET_SPEED=bulletSpeed, BULLET_REPEAT=bulletRepeat, BULLET_RAD=bulletRad,
+							   AST_SPEEDS=list(astSpeeds), AST_DIAMS=list(astDiams), NUM_FRAMES=totalFrames,
+							   PTS=list(points), SHIP_RAD=shipRad)
+		self.budget = dt * timeFraction
+		self.batchSize = batchSize
+		self.rolloutFrames = rolloutFrames
+		self.aliveBonus = aliveBonus
+		self.exploration = exploration
+		self.rng = np.random.RandomState(seed)
+		# The asteroids are put in the model directly, without a view
+		self.model = Simulation(NoAI(), self.consts, "brute")
+		self.model.view = NULL_VIEW
+		self.env = None
+		self.resetStats()
+
+	def resetStats(self):
+		self.rollouts = 0
+		self.searchTime = 0.0
+		self.frames = 0
+		# Frames the game played another command than the one returned, and
+		# calls that found the model stale
+		self.missed = 0
+		self.stale = 0
+
+	def newGame(self):
+		# Simulation.newGame reseeds the global random module for the AI, so
+		# keep the game's sequence
+		state = random.getstate()
+		self.model.newGame(0)
+		random.setstate(state)
+		self.root = Node()
+		# Whether cmd was returned and is not yet played in the model
+		self.answered = False
+		self.cmd = None
+
+	# Called to get the player's next command, see ShipAI.getAICommand
+	def getAICommand(self, asteroids, heading, framesToFire):
+		startTime = clock()
+		if self.answered:
+			self.catchUp(asteroids, heading, framesToFire)
+		self.sync(asteroids, heading, framesToFire)
+		batchTime = 0.0
+		while len(self.root.children) == 0 or clock() - startTime + batchTime < self.budget:
+			batchStart = clock()
+			self.search()
+			batchTime = clock() - batchStart
+
+		(action, child) = self.best()
+		self.root = child
+		self.cmd = ACTIONS[action]
+		self.answered = True
+		self.searchTime += clock() - startTime
+		self.frames += 1
+		return self.cmd
+
+	# Plays the last frame in the model with the command the game played,
+	# and starts a new tree if it wasn't the one returned or the model's
+	# asteroids aren't those handed in
+	def catchUp(self, asteroids, heading, framesToFire):
+		cmd = self.playedCommand(heading, framesToFire)
+		if cmd != self.cmd:
+			self.missed += 1
+			self.root = Node()
+		self.model.advance(cmd)
+		if not self.predicted(asteroids):
+			self.stale += 1
+			self.root = Node()
+
+	# The command played last frame, from the heading and framesToFire the
+	# ship has now: a shot sets framesToFire to BULLET_REPEAT, anything else
+	# turns the ship and counts it down.  The one returned if it fits.
+	def playedCommand(self, heading, framesToFire):
+		c = self.consts
+		m = self.model
+		cmd = self.cmd
+		if framesToFire == c.BULLET_REPEAT:
+			return cmd if cmd != None and cmd[0] else (True, 0)
+		turn = int(round(((heading - 90 - m.heading + 180) % 360 - 180) / c.TURN_RATE))
+		if cmd == None:
+			return cmd if turn == 0 else (False, turn)
+		canFire = m.framesToFire <= 0 and not m.shieldActive
+		if not (cmd[0] and canFire) and cmd[1] == turn:
+			return cmd
+		return (False, turn)
+
+	# True if the model's asteroids are those handed to the AI
+	def predicted(self, asteroids):
+		a = self.model.asteroids
+		live = a.live()
+		if len(live) != len(asteroids):
+			return False
+		positions = dict(zip(a.ids[live].tolist(), a.pos[live].tolist()))
+		for rock in asteroids:
+			pos = positions.get(rock.id)
+			if pos == None or abs(pos[0] - rock.pos[0]) > SYNC_TOLERANCE or \
+			   abs(pos[1] - rock.pos[1]) > SYNC_TOLERANCE:
+				return False
+		return True
+
+	# The (action, node) to play: the most tried move, or the shield if only
+	# it lets the ship live
+	def best(self):
+		children = self.root.children
+		moves = [item for item in children.items() if item[0] != SHIELD] or list(children.items())
+		if SHIELD in children and children[SHIELD].survived > 0 and \
+		   all(node.survived == 0 for (action, node) in moves):
+			return (SHIELD, children[SHIELD])
+		return max(moves, key=lambda item: item[1].visits)
+
+	# Puts the model in the position handed to the AI.  Its bullets, shield
+	# and frame are already there, from the commands played.
+	def sync(self, asteroids, heading, framesToFire):
+		c = self.consts
+		m = self.model
+		a = m.asteroids
+		a.clear()
+		for rock in asteroids:
+			size = c.AST_DIAMS.index(int(round(rock.rad * 2)))
+			a.add(rock.id, rock.pos[0], rock.pos[1], rock.vel[0], rock.vel[1], rock.rad, size)
+		# The model counts the IDs given out as the game does, but the
+		# asteroid that had the last one may be gone
+		m.currID = max([rock.id for rock in asteroids] + [m.currID])
+		m.heading = (heading - 90) % 360
+		m.framesToFire = framesToFire
+		m.alive = True
+
+	# Rows for a batch, loaded with the model's position.  The VectorEnv is
+	# built again if the position has more asteroids than it has room for.
+	def loadRows(self):
+		numAlive = self.model.asteroids.numAlive()
+		if self.env == None or numAlive * 2 ** (len(self.consts.AST_DIAMS) - 1) > self.env.alive.shape[1]:
+			capacity = 2 * numAlive * 2 ** (len(self.consts.AST_DIAMS) - 1)
+			self.env = VectorEnv(self.batchSize, [0], self.consts, autoReset=False, capacity=capacity)
+		self.env.loadGame(self.model)
+		return self.env
+
+	# One batch: picks batchSize paths, plays them out together and backs up
+	# their values
+	def search(self):
+		paths = [self.select() for i in range(self.batchSize)]
+		(values, alive) = self.rollout([[action for (action, node) in path] for path in paths])
+		for (path, value, lived) in zip(paths, values.tolist(), alive.tolist()):
+			self.root.value += value
+			for (action, node) in path:
+				node.value += value
+				node.survived += lived
+		self.rollouts += len(paths)
+
+	# A path down the tree, as [(action, node)], ending at a new node unless
+	# it is rolloutFrames deep.  Every node on it gets its visit now, so the
+	# next path of the batch tends to go elsewhere.
+	def select(self):
+		node = self.root
+		node.visits += 1
+		path = []
+		while len(path) < self.rolloutFrames:
+			moves = MOVES
+			if len(path) == 0 and not self.model.shieldUsed:
+				moves = MOVES + [SHIELD]
+			untried = [action for action in moves if action not in node.children]
+			if len(untried) > 0:
+				action = untried[self.rng.randint(len(untried))]
+				child = node.children[action] = Node()
+				child.visits += 1
+				path.append((action, child))
+				break
+			(action, node) = max(node.children.items(), key=lambda item: self.uct(node, item[1]))
+			node.visits += 1
+			path.append((action, node))
+		return path
+
+	def uct(self, parent, child):
+		return child.value / child.visits + self.exploration * math.sqrt(math.log(parent.visits) / child.visits)
+
+	# The value of every path: the score it makes in rolloutFrames frames,
+	# the path's actions first and random ROLLOUT_ACTIONS after them,
+	# plus aliveBonus if the ship lives through them.  Returns the values and
+	# whether the ship lived.
+	def rollout(self, paths):
+		env = self.loadRows()
+		actions = ROLLOUT_ACTIONS[self.rng.randint(0, len(ROLLOUT_ACTIONS), (self.rolloutFrames, len(paths)))]
+		for (r, path) in enumerate(paths):
+			actions[:len(path), r] = path
+		values = np.zeros(len(paths))
+		for t in range(self.rolloutFrames):
+			(obs, rewards, dones) = env.step(actions[t])
+			values += rewards
+			if env.over.all():
+				break
+		dead = env.over & (env.frame < self.consts.NUM_FRAMES)
+		values[~dead] += self.aliveBonus
+		return (values, ~dead)
+
+	def rolloutsPerSecond(self):
+		return self.rollouts / self.searchTime if self.searchTime > 0 else 0.0
+
+	def report(self):
+		return "%d rollouts in %d frames, %.0f rollouts/s, %.1f per frame, %d missed, %d stale" % \
+			   (self.rollouts, self.frames, self.rolloutsPerSecond(), self.rollouts / float(max(self.frames, 1)),
+				self.missed, self.stale)
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	for consts in scenarioArgs(args):
+		print("Scenario " + scenarioName(consts))
+		numGames = int(args[0]) if len(args) > 0 else 3
+		shipAI = createShipAI(MCTSShipAI, consts, (consts.SHIP_RAD,))
+		sim = Simulation(shipAI, consts)
+		baseline = Simulation(createShipAI(ShipAI, consts), consts)
+		total = [0, 0]
+		for seed in consts.SEEDS[:numGames]:
+			shipAI.resetStats()
+			startTime = time.time()
+			score = sim.run(seed)
+			baselineScore = baseline.run(seed)
+			total[0] += score
+			total[1] += baselineScore
+			print("Seed %d: score %d (ShipAI %d) frames %d slow frames %d (%.1f seconds), %s" %
+				  (seed, score, baselineScore, sim.currFrame, sim.slowFrames, time.time() - startTime,
+				   shipAI.report()))
+		print("Total %d (ShipAI %d)" % tuple(total))
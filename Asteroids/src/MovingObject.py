@@ -1,18 +1,132 @@
-from panda3d.core import Vec2
-from math import sin, cos, radians, sqrt
-from SecondOrderPoly import SecondOrderPoly
-from pandac.PandaModules import Point2
+from math import sin, cos, radians, sqrt, floor
+from SecondOrderPoly import SecondOrderPoly, solveQuadraticEquation
+from Vectors import Vec2, Point2
+
+INF = float("inf")
 
 def normalizeDegrees(H):
 	return H % 360
 
-class MovingObject:
-	def __init__(self, idNum, pos, heading, speed, rad):
+# Wrapping, as updatePos does it: once a coordinate x moving at speed v gets
+# more than rad past the edge of the field it jumps to the opposite edge,
+# -halfSz or halfSz.  Returns (first, period): the time of the first jump and
+# the time between later ones, or None if v is 0.  With dt the jumps happen
+# at the end of a frame, as in the game; without, at the exact crossing.
+def wrapTimes(x, v, rad, halfSz, dt=None):
+	if v == 0:
+		return None
+	speed = abs(v)
+	if v > 0:
+		first = (halfSz + rad - x) / speed
+	else:
+		first = (x + rad + halfSz) / speed
+	period = (2 * halfSz + rad) / speed
+	if dt:
+		return (max(floor(first / dt) + 1, 1) * dt, (floor(period / dt) + 1) * dt)
+	return (max(first, 0.0), period)
+
+# The coordinate at time t, with wrapping
+def wrapCoordinate(x, v, rad, halfSz, t, dt=None):
+	times = wrapTimes(x, v, rad, halfSz, dt)
+	if times == None or t < times[0]:
+		return x + v * t
+	(first, period) = times
+	edge = -halfSz if v > 0 else halfSz
+	since = (t - first) % period
+	# A time right at the end of a period, give or take rounding, is the
+	# start of the next one
+	if period - since <= 1e-9 * period:
+		since = 0.0
+	return edge + v * since
+
+# The first count stretches of a wrapping coordinate as (start, end, offset):
+# from time start to end the coordinate is x + v * t + offset
+def wrapStretches(x, v, rad, halfSz, dt=None, count=3):
+	times = wrapTimes(x, v, rad, halfSz, dt)
+	if times == None:
+		return [(0.0, INF, 0.0)]
+	(first, period) = times
+	edge = -halfSz if v > 0 else halfSz
+	stretches = [(0.0, first, 0.0)]
+	for i in range(count - 1):
+		start = first + i * period
+		stretches.append((start, start + period, edge - (x + v * start)))
+	return stretches
+
+# The stretches of a wrapping coordinate, relative to a point at q moving at
+# w, that come within reach of it on that axis, as (start, end, offset)
+def nearStretches(x, v, rad, q, w, reach, halfSz, dt, horizon):
+	result = []
+	d = v - w
+	for (start, end, offset) in wrapStretches(x, v, rad, halfSz, dt):
+		if horizon != None and end > horizon:
+			end = horizon
+		if start >= end:
+			continue
+		if end < INF:
+			a = x + offset - q + d * start
+			b = x + offset - q + d * end
+			if (a > reach and b > reach) or (a < -reach and b < -reach):
+				continue
+		result.append((start, end, offset))
+	return result
+
+# Earliest time at which a circle at (x, y) moving at (vx, vy) and wrapping
+# comes within reach of a point at (qx, qy) moving at (wx, wy) that doesn't
+# wrap, or None.  Each combination of stretches of x and y is one image of
+# the circle, 9 in all.  The stretches are first tested one axis at a time
+# against the point's reach, and the images left over by a bounding box, so
+# usually only one quadratic is solved.
+def wrappedContact(x, y, vx, vy, rad, qx, qy, wx, wy, reach, halfSz, dt=None, horizon=None):
+	(DX, DY) = (vx - wx, vy - wy)
+	best = None
+	nearX = nearStretches(x, vx, rad, qx, wx, reach, halfSz, dt, horizon)
+	if len(nearX) == 0:
+		return None
+	for (sy, ey, oy) in nearStretches(y, vy, rad, qy, wy, reach, halfSz, dt, horizon):
+		for (sx, ex, ox) in nearX:
+			t0 = max(sx, sy)
+			t1 = min(ex, ey)
+			if t0 >= t1 or (best != None and t0 >= best):
+				continue
+			# The image relative to the point, at time 0
+			(X, Y) = (x + ox - qx, y + oy - qy)
+			if t1 < INF:
+				(ax, bx) = (X + DX * t0, X + DX * t1)
+				(ay, by) = (Y + DY * t0, Y + DY * t1)
+				if min(ax, bx) > reach or max(ax, bx) < -reach or \
+				   min(ay, by) > reach or max(ay, by) < -reach:
+					continue
+			(X0, Y0) = (X + DX * t0, Y + DY * t0)
+			if X0 * X0 + Y0 * Y0 <= reach * reach:
+				t = t0
+			else:
+				a = DX * DX + DY * DY
+				b = 2 * (X * DX + Y * DY)
+				c = X * X + Y * Y - reach * reach
+				t = None
+				if a > 0:
+					for root in solveQuadraticEquation(a, b, c):
+						if t0 < root < t1:
+							t = root
+							break
+			if t != None and (best == None or t < best):
+				best = t
+	return best
+
+class MovingObject(object):
+	__slots__ = ["id", "pos", "speed", "vel", "rad"]
+
+	# vel, when given, is used as the velocity instead of the one computed
+	# from heading and speed
+	def __init__(self, idNum, pos, heading, speed, rad, vel=None):
 		self.id = idNum
 		self.pos = pos
 		self.speed = speed
-		rads = radians(heading)
-		self.vel = Vec2(cos(rads), sin(rads)) * speed
+		if vel == None:
+			rads = radians(heading)
+			vel = Vec2(cos(rads), sin(rads)) * speed
+		self.vel = vel
 		self.rad = rad
 	
 	def distance(self, other):
@@ -42,6 +156,29 @@ class MovingObject:
 		result = poly.smallestPostiveRoot()
 		return result
 	
+	# The position at time t, wrapping around a field of fieldSz, see
+	# wrapTimes for dt
+	def positionAt(self, t, fieldSz, dt=None):
+		halfSz = fieldSz / 2.0
+		return Point2(wrapCoordinate(self.pos[0], self.vel[0], self.rad, halfSz, t, dt),
+					  wrapCoordinate(self.pos[1], self.vel[1], self.rad, halfSz, t, dt))
+
+	# Like collideWithObject, but this object wraps around a field of fieldSz,
+	# so contacts through an edge are found and ones after it has wrapped
+	# away are not.  other is taken not to wrap: the ship stays put and
+	# bullets are removed at the edge.  Returns the earliest contact time,
+	# 0 if they touch already, or None; looks no further than horizon.
+	def collideWithObjectWrapped(self, other, fieldSz, dt=None, horizon=None):
+		return wrappedContact(self.pos[0], self.pos[1], self.vel[0], self.vel[1], self.rad,
+							  other.pos[0], other.pos[1], other.vel[0], other.vel[1],
+							  self.rad + other.rad, fieldSz / 2.0, dt, horizon)
+
+	# Earliest time at which the origin is inside this object, wrapping
+	# around a field of fieldSz, or None
+	def collideWithPointAtOriginWrapped(self, fieldSz, dt=None, horizon=None):
+		return wrappedContact(self.pos[0], self.pos[1], self.vel[0], self.vel[1], self.rad,
+							  0.0, 0.0, 0.0, 0.0, self.rad, fieldSz / 2.0, dt, horizon)
+
 	def collideWithPointAtOrigin(self):
 		x = self.pos[0]
 		y = self.pos[1]
@@ -65,4 +202,11 @@ if __name__ == "__main__":
 	
 	a1 = MovingObject(0, Point2(-3, -3), 45, sqrt(8), 1)
 	a2 = MovingObject(0, Point2(0,0), 45, sqrt(2), 1)
-	print(a1.collideWithObject(a2))
\ No newline at end of file
+	print(a1.collideWithObject(a2))
+
+	# Moving away from the ship, but it comes back through the left edge
+	a1 = MovingObject(0, Point2(300, 0), 0, 100, 10)
+	ship = MovingObject(1, Point2(0, 0), 0, 0, 8)
+	print(a1.collideWithObject(ship))
+	print(a1.collideWithObjectWrapped(ship, 700, 0.05))
+	print(a1.positionAt(1, 700, 0.05))
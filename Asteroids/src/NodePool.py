@@ -0,0 +1,35 @@
+# Pool of display nodes, so the window does not create and destroy a
+# NodePath for every shot, split or new game.
+#
+# Nodes are grouped by kind, e.g. "bullet" or ("asteroid", 1), and every node
+# of a kind has the same texture and scale.  addKind() makes the first ones
+# up front with makeNode(tex, scale) (loadObject in main.py) and stashes
+# them; acquire() unstashes one and release() stashes it again.  A kind that
+# runs dry makes another node, which stays in the pool once released, so the
+# pool only grows to the most nodes of a kind shown at once.
+class NodePool:
+	def __init__(self, makeNode):
+		self.makeNode = makeNode
+		self.kinds = {}
+		self.free = {}
+
+	def addKind(self, kind, tex, scale, count):
+		self.kinds[kind] = (tex, scale)
+		self.free[kind] = []
+		for i in range(count):
+			node = self.makeNode(tex, scale)
+			node.stash()
+			self.free[kind].append(node)
+
+	def acquire(self, kind):
+		if self.free[kind]:
+			node = self.free[kind].pop()
+		else:
+			(tex, scale) = self.kinds[kind]
+			node = self.makeNode(tex, scale)
+		node.unstash()
+		return node
+
+	def release(self, kind, node):
+		node.stash()
+		self.free[kind].append(node)
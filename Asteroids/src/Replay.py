@@ -0,0 +1,268 @@
+# Compact replays of games played by Simulation.
+#
+# A game only depends on its seed, its constants and the command the AI gave
+# on every frame, so that is what a replay keeps: the seed, the scenario
+# (name and every constant), one byte per frame for the command and, every
+# KEYFRAME_INTERVAL frames, a keyframe with the whole state of the game at the
+# start of that frame.  It plays back through Simulation.advance without the
+# AI, and seek() jumps to any frame by restoring the keyframe before it and
+# playing at most KEYFRAME_INTERVAL - 1 frames, however long the game.
+#
+# Record a game by setting a Recorder as the simulation's recorder:
+#
+#	sim.recorder = Recorder()
+#	sim.run(seed)
+#	sim.recorder.replay(sim).save("game.replay")
+#
+# A command byte is
+#
+#	bit 7     -- the shield (the AI returned None)
+#	bit 6     -- fire
+#	bits 0-5  -- turnDir + 32
+#
+# The file is MAGIC, a version byte and the zlib compressed rest: the JSON
+# header (seed, scenario, constants, keyframe interval and the result of the
+# game), the commands and the keyframes.  A 2000 frame game takes 2 to 5 KB.
+#
+# Usage:  python Replay.py PATH [--frame N]
+#         plays PATH back, checks that it ends with the recorded score and
+#         with --frame prints the state at frame N
+
+import json
+import struct
+import sys
+import time
+import zlib
+import numpy as np
+from Scenario import Scenario, constantsOf, scenarioName
+from Simulation import Simulation
+
+MAGIC = b"ASTREPLAY"
+VERSION = 1
+KEYFRAME_INTERVAL = 500
+
+SHIELD_BIT = 0x80
+FIRE_BIT = 0x40
+TURN_BIAS = 32
+
+# frame, currID, framesToFire, shieldFrames, gameScore, shieldUsed,
+# shieldActive, heading, hits, number of asteroids and of bullets, bullet head
+STATE = struct.Struct("<5i2Bd4i3i")
+LENGTH = struct.Struct("<I")
+
+def packCommand(cmd):
+	if cmd == None:
+		return SHIELD_BIT
+	turn = int(cmd[1])
+	if turn != cmd[1] or not -TURN_BIAS <= turn < TURN_BIAS:
+		raise ValueError("turnDir %r can't be recorded" % (cmd[1],))
+	return (FIRE_BIT if cmd[0] else 0) | (turn + TURN_BIAS)
+
+def unpackCommand(byte):
+	if byte & SHIELD_BIT:
+		return None
+	return (bool(byte & FIRE_BIT), (byte & 0x3f) - TURN_BIAS)
+
+# The state of sim at the start of its current frame, as bytes
+def packState(sim):
+	a = sim.asteroids
+	b = sim.bullets
+	live = a.live()
+	slots = np.flatnonzero(b.alive)
+	head = STATE.pack(sim.currFrame, sim.currID, sim.framesToFire, sim.shieldFrames, sim.gameScore,
+					  sim.shieldUsed, sim.shieldActive, sim.heading, *(sim.hits + [len(live), len(slots), b.head]))
+	return b"".join([head,
+					 a.pos[live].astype("<f8").tobytes(), a.vel[live].astype("<f8").tobytes(),
+					 a.size[live].astype("i1").tobytes(), a.ids[live].astype("<i4").tobytes(),
+					 slots.astype("<i2").tobytes(), b.pos[slots].astype("<f8").tobytes(),
+					 b.vel[slots].astype("<f8").tobytes(), b.age[slots].astype("<i4").tobytes()])
+
+# Reads arrays and length prefixed chunks off data, in order
+class Reader:
+	def __init__(self, data, offset=0):
+		self.data = data
+		self.offset = offset
+
+	def array(self, dtype, count):
+		result = np.frombuffer(self.data, dtype, count, self.offset)
+		self.offset += result.nbytes
+		return result
+
+	def length(self):
+		(length,) = LENGTH.unpack_from(self.data, self.offset)
+		self.offset += LENGTH.size
+		return length
+
+	def chunk(self):
+		length = self.length()
+		self.offset += length
+		return self.data[self.offset - length:self.offset]
+
+# Puts sim, started with newGame, in the state packed by packState
+def restoreState(sim, data):
+	c = sim.consts
+	fields = STATE.unpack_from(data)
+	(sim.currFrame, sim.currID, sim.framesToFire, sim.shieldFrames, sim.gameScore) = fields[:5]
+	sim.shieldUsed = bool(fields[5])
+	sim.shieldActive = bool(fields[6])
+	sim.heading = fields[7]
+	sim.hits = list(fields[8:12])
+	(n, m, head) = fields[12:]
+	reader = Reader(data, STATE.size)
+	pos = reader.array("<f8", 2 * n).reshape((n, 2))
+	vel = reader.array("<f8", 2 * n).reshape((n, 2))
+	size = reader.array("i1", n)
+	ids = reader.array("<i4", n)
+	slots = reader.array("<i2", m)
+	bulletPos = reader.array("<f8", 2 * m).reshape((m, 2))
+	bulletVel = reader.array("<f8", 2 * m).reshape((m, 2))
+	age = reader.array("<i4", m)
+
+	a = sim.asteroids
+	a.clear()
+	sim.view.clear()
+	for i in range(n):
+		rad = c.AST_DIAMS[size[i]] / 2.0
+		(x, y) = pos[i].tolist()
+		(vx, vy) = vel[i].tolist()
+		a.add(int(ids[i]), x, y, vx, vy, rad, int(size[i]))
+		sim.view.add(int(ids[i]), x, y, vx, vy, rad)
+	b = sim.bullets
+	b.clear()
+	b.pos[slots] = bulletPos
+	b.vel[slots] = bulletVel
+	b.rad[slots] = c.BULLET_RAD
+	b.age[slots] = age
+	b.alive[slots] = True
+	b.head = head
+	sim.alive = True
+
+# Stands in for the AI of a simulation that is only advanced
+class NoAI:
+	def newGame(self):
+		pass
+
+class Replay:
+	def __init__(self, seed, consts, commands, keyframes, interval=KEYFRAME_INTERVAL, result=None):
+		self.seed = seed
+		self.consts = consts
+		self.commands = bytearray(commands)
+		self.keyframes = keyframes
+		self.interval = interval
+		# {"score", "hits", "frames"} of the recorded game
+		self.result = result
+
+	def numFrames(self):
+		return len(self.commands)
+
+	def command(self, frame):
+		return unpackCommand(self.commands[frame])
+
+	def simulation(self):
+		return Simulation(NoAI(), self.consts)
+
+	# A simulation at the start of frame, from the keyframe before it.  sim
+	# is reused if given.
+	def seek(self, frame, sim=None):
+		if not 0 <= frame <= self.numFrames():
+			raise IndexError("frame %d not in the replay" % frame)
+		if sim == None:
+			sim = self.simulation()
+		sim.newGame(self.seed)
+		key = min(frame // self.interval, len(self.keyframes) - 1)
+		if key > 0:
+			restoreState(sim, self.keyframes[key])
+		while sim.currFrame < frame and sim.alive:
+			sim.advance(self.command(sim.currFrame))
+		return sim
+
+	# Plays the game from frame start to the end and returns the simulation
+	def play(self, start=0, sim=None):
+		sim = self.seek(start, sim)
+		while sim.alive and sim.currFrame < self.numFrames():
+			sim.advance(self.command(sim.currFrame))
+		return sim
+
+	def toBytes(self):
+		header = json.dumps({"seed": self.seed, "scenario": scenarioName(self.consts),
+							 "constants": constantsOf(self.consts), "interval": self.interval,
+							 "result": self.result}, sort_keys=True).encode("utf-8")
+		parts = [LENGTH.pack(len(header)), header, LENGTH.pack(len(self.commands)), bytes(self.commands),
+				 LENGTH.pack(len(self.keyframes))]
+		for keyframe in self.keyframes:
+			parts += [LENGTH.pack(len(keyframe)), keyframe]
+		return MAGIC + bytes(bytearray([VERSION])) + zlib.compress(b"".join(parts), 9)
+
+	def save(self, path):
+		with open(path, "wb") as f:
+			f.write(self.toBytes())
+
+def replayFromBytes(data):
+	if data[:len(MAGIC)] != MAGIC:
+		raise ValueError("not a replay")
+	version = bytearray(data[len(MAGIC):len(MAGIC) + 1])[0]
+	if version != VERSION:
+		raise ValueError("replay version %d, expected %d" % (version, VERSION))
+	reader = Reader(zlib.decompress(data[len(MAGIC) + 1:]))
+	header = json.loads(reader.chunk().decode("utf-8"))
+	commands = reader.chunk()
+	keyframes = [reader.chunk() for i in range(reader.length())]
+	consts = Scenario(header["scenario"], **header["constants"])
+	return Replay(header["seed"], consts, commands, keyframes, header["interval"], header["result"])
+
+def loadReplay(path):
+	with open(path, "rb") as f:
+		return replayFromBytes(f.read())
+
+# Records the games of the Simulation it is set on, see Simulation.recorder
+class Recorder:
+	def __init__(self, interval=KEYFRAME_INTERVAL):
+		self.interval = interval
+		self.seed = None
+
+	def newGame(self, sim, seed):
+		self.seed = seed
+		self.consts = sim.consts
+		self.commands = bytearray()
+		self.keyframes = []
+
+	# Called before frame is played with cmd
+	def frame(self, sim, cmd):
+		if sim.currFrame % self.interval == 0:
+			self.keyframes.append(packState(sim))
+		self.commands.append(packCommand(cmd))
+
+	# The replay of the game recorded so far, with its result as sim has it
+	def replay(self, sim):
+		result = {"score": sim.gameScore, "hits": list(sim.hits), "frames": sim.currFrame}
+		return Replay(self.seed, self.consts, self.commands, list(self.keyframes), self.interval, result)
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	frame = None
+	if "--frame" in args:
+		i = args.index("--frame")
+		frame = int(args[i + 1])
+		del args[i:i + 2]
+	replay = loadReplay(args[0])
+	print("Seed %d, scenario %s, %d frames, %d keyframes" % (replay.seed, scenarioName(replay.consts),
+															 replay.numFrames(), len(replay.keyframes)))
+	startTime = time.time()
+	sim = replay.play()
+	print("Played back in %.3f seconds: score %d hits %s frames %d" % (time.time() - startTime, sim.gameScore,
+																		 sim.hits, sim.currFrame))
+	result = replay.result
+	if result != None and (result["score"], result["hits"], result["frames"]) != (sim.gameScore, sim.hits, sim.currFrame):
+		print("MISMATCH: recorded score %d hits %s frames %d" % (result["score"], result["hits"], result["frames"]))
+		sys.exit(1)
+	if frame != None:
+		startTime = time.time()
+		sim = replay.seek(frame)
+		a = sim.asteroids
+		print("Frame %d (seek %.3f seconds): heading %s framesToFire %d shield %s hits %s score %d" %
+			  (sim.currFrame, time.time() - startTime, sim.heading, sim.framesToFire,
+			   sim.shieldFrames if sim.shieldActive else "off", sim.hits, sim.gameScore))
+		print("Next command %s" % (replay.command(frame) if frame < replay.numFrames() else None,))
+		for i in a.live().tolist():
+			print("  asteroid %4d size %d pos (%.2f, %.2f) vel (%.2f, %.2f)" %
+				  ((a.ids[i], a.size[i]) + tuple(a.pos[i].tolist()) + tuple(a.vel[i].tolist())))
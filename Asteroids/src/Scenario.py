@@ -0,0 +1,149 @@
+# Scenarios: the game constants loaded from a file instead of edited in
+# GameConstants.py.
+#
+# A Scenario has an attribute for every constant of GameConstants, so it can
+# be given wherever a consts module is taken (Simulation, runTournament,
+# createShipAI, ...).  Constants a scenario doesn't set keep the values of
+# GameConstants.  AST_DIAMS, AST_SPEEDS and NUM_GAMES are computed from the
+# other constants, as in GameConstants, unless the scenario sets them.
+#
+# Scenario files are JSON.  Upper case keys are constants, the lower case
+# keys are:
+#
+#	"name"        -- the scenario's name, the file name by default
+#	"description" -- what the scenario is for
+#	"base"        -- a scenario file or preset to start from
+#	"sweep"       -- {constant: [values]}; the file then stands for one scenario
+#	                 for every combination of the values
+#
+# For example the 5,000 asteroid preset, scenarios/stress_asteroids.json:
+#
+#	{"INIT_NUM_ASTEROIDS": 5000, "SEEDS": [12513, 2234, 23]}
+#
+# and a sweep over the number of asteroids and the frame time:
+#
+#	{"sweep": {"INIT_NUM_ASTEROIDS": [10, 100, 1000], "DT": [0.02, 0.05]}}
+#
+# A name instead of a path loads the preset of that name from scenarios/.
+
+import copy
+import itertools
+import json
+import os
+import GameConstants
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+
+NAMES = sorted(name for name in dir(GameConstants) if name.isupper())
+DERIVED = ["AST_DIAMS", "AST_SPEEDS", "NUM_GAMES"]
+
+class Scenario:
+	def __init__(self, name="default", **constants):
+		self.name = name
+		for key in NAMES:
+			setattr(self, key, copy.deepcopy(getattr(GameConstants, key)))
+		self.explicit = set()
+		self.update(constants)
+
+	# Sets constants, given as a dict, and recomputes the derived ones
+	def update(self, constants):
+		for (key, value) in constants.items():
+			if key not in NAMES:
+				raise ValueError("unknown constant %s in scenario %s" % (key, self.name))
+			setattr(self, key, value)
+			if key in DERIVED:
+				self.explicit.add(key)
+		self.derive()
+
+	# Same formulas as GameConstants
+	def derive(self):
+		if "AST_DIAMS" not in self.explicit:
+			self.AST_DIAMS = [2*self.INIT_AST_RAD, 2*int(self.INIT_AST_RAD*self.AST_SZ_FACTOR),
+							  2*int(self.INIT_AST_RAD*self.AST_SZ_FACTOR*self.AST_SZ_FACTOR)]
+		if "AST_SPEEDS" not in self.explicit:
+			self.AST_SPEEDS = [self.INIT_AST_SPEED, int(self.INIT_AST_SPEED*self.AST_SPEED_FACTOR),
+							   int(self.INIT_AST_SPEED*self.AST_SPEED_FACTOR*self.AST_SPEED_FACTOR)]
+		if "NUM_GAMES" not in self.explicit:
+			self.NUM_GAMES = len(self.SEEDS)
+
+	# A copy with some constants changed
+	def copy(self, name=None, **constants):
+		result = copy.deepcopy(self)
+		if name != None:
+			result.name = name
+		result.update(constants)
+		return result
+
+	# Every constant, for recording which configuration produced a result
+	def constants(self):
+		return constantsOf(self)
+
+	def __str__(self):
+		return self.name
+
+# The constants of a Scenario or of a consts module like GameConstants
+def constantsOf(consts):
+	return dict((key, getattr(consts, key)) for key in NAMES)
+
+# "default" for GameConstants itself
+def scenarioName(consts):
+	if consts is GameConstants:
+		return "default"
+	if isinstance(consts, Scenario):
+		return consts.name
+	return consts.__name__
+
+def findScenario(path):
+	if os.path.exists(path):
+		return path
+	preset = os.path.join(SCENARIO_DIR, path if path.endswith(".json") else path + ".json")
+	if os.path.exists(preset):
+		return preset
+	raise IOError("no scenario file or preset named " + path)
+
+# (name, constants, sweep) of a scenario file, with its bases applied
+def readScenario(path):
+	path = findScenario(path)
+	with open(path) as f:
+		data = json.load(f)
+	name = data.get("name", os.path.splitext(os.path.basename(path))[0])
+	constants = {}
+	sweep = {}
+	if "base" in data:
+		base = data["base"]
+		if not os.path.isabs(base) and os.path.exists(os.path.join(os.path.dirname(path), base)):
+			base = os.path.join(os.path.dirname(path), base)
+		(baseName, constants, sweep) = readScenario(base)
+	constants.update((key, value) for (key, value) in data.items() if key.isupper())
+	sweep.update(data.get("sweep", {}))
+	return (name, constants, sweep)
+
+# Every scenario a file stands for: one, or one per combination of its
+# sweep.  Swept scenarios are named like "name[DT=0.02,INIT_NUM_ASTEROIDS=10]".
+def loadScenarios(path):
+	(name, constants, sweep) = readScenario(path)
+	base = Scenario(name, **constants)
+	keys = sorted(sweep)
+	if len(keys) == 0:
+		return [base]
+	result = []
+	for values in itertools.product(*[sweep[key] for key in keys]):
+		label = ",".join("%s=%s" % (key, json.dumps(value)) for (key, value) in zip(keys, values))
+		result.append(base.copy("%s[%s]" % (name, label), **dict(zip(keys, values))))
+	return result
+
+def loadScenario(path):
+	scenarios = loadScenarios(path)
+	if len(scenarios) != 1:
+		raise ValueError("%s is a sweep of %d scenarios" % (path, len(scenarios)))
+	return scenarios[0]
+
+# Takes "--scenario PATH" out of args (a list of command line arguments) and
+# returns the scenarios it names, or [default] without one
+def scenarioArgs(args, default=GameConstants):
+	if "--scenario" not in args:
+		return [default]
+	i = args.index("--scenario")
+	path = args[i + 1]
+	del args[i:i + 2]
+	return loadScenarios(path)
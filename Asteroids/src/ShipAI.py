@@ -1,10 +1,8 @@
-from panda3d.core import Vec2, Point2
+from Vectors import Vec2, Point2
 from MovingObject import MovingObject, normalizeDegrees
+from ThreatCache import ThreatCache
 import math
 
-from panda3d import bullet
-from matplotlib.cbook import Null
-
 origin = Vec2(0, 0)
 
 # this function can be used to display all the asteroid's values to the screen
@@ -36,10 +34,15 @@ class ShipAI:
 		self.hittedAst = []
 		self.count = 0
 		self.dieFrame = 0
+		# Ship impact and shield test of every asteroid, by ID.  The ship is
+		# taken to have radius 10.
+		self.threats = ThreatCache(10, dt, fieldSz)
 	# Called when a new game of asteroids is started.
 	def newGame(self):
 		self.pts = 0
 		self.hittedAst = []
+		self.count = 0
+		self.threats.newGame()
 	
 	# Called to get the player's next command.
 	#
@@ -101,7 +104,7 @@ class ShipAI:
 		
 		if len(asteroids) == 0: return (False, 0)
 		
-		ship = MovingObject(1,origin,heading,0,10)
+		self.threats.update(asteroids)
 		
 		
 		firstAttack = []
@@ -110,12 +113,12 @@ class ShipAI:
 		
 
 		for asteroid in asteroids:
-			nextDtPos = asteroid.pos+asteroid.vel*self.dt
-			if (nextDtPos - ship.pos).length()< asteroid.rad+ship.rad:
+			impactTime = self.threats.impact(asteroid.id)
+			if self.threats.shieldFrames(asteroid.id) == 0:
 				return None
 				
-			elif(asteroid.collideWithObject(ship)):
-				asteroidInfo = (asteroid,asteroid.collideWithObject(ship))
+			elif(impactTime != None):
+				asteroidInfo = (asteroid,impactTime)
 				firstAttack.append(asteroidInfo)
 			else:
 				asteroidInfo = (asteroid,asteroid.speed/asteroid.rad)
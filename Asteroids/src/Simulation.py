@@ -0,0 +1,332 @@
+# Headless version of the game played by AsteroidsDemo in main.py.
+#
+# The rules are the same as in AsteroidsDemo.gameLoop (updatePos,
+# asteroidHit, updateShip, fire, the shield and the scoring), but the world
+# is kept in NumPy arrays (see BodyArrays) instead of NodePaths and Python
+# tags, and frames are stepped as fast as the CPU allows.  Movement, wrapping
+# and the collision tests are vectorized, so the frame cost stays flat as the
+# number of asteroids grows.  No window is opened, so a
+# full tournament over SEEDS takes seconds instead of minutes.
+#
+# Usage:  python Simulation.py [grid|sweep|brute] [--scenario PATH]
+
+import copy
+import random
+import sys
+import time
+from math import sin, cos, pi, radians, sqrt
+import numpy as np
+import GameConstants
+from BodyArrays import BodyArrays
+from BroadPhase import createBroadPhase
+from BulletRing import BulletRing, bulletCapacity, bulletLife
+from MovingObject import normalizeDegrees
+from Scenario import scenarioArgs, scenarioName
+from ShipAI import ShipAI
+from WorldView import WorldView, NULL_VIEW
+
+# Builds a ship AI with the same arguments AsteroidsDemo uses.  extraArgs are
+# appended for AIs that take more, e.g. myShipAI wants (SHIP_RAD,).
+def createShipAI(aiClass=ShipAI, consts=GameConstants, extraArgs=()):
+	c = consts
+	args = (c.FIELD_SZ, c.AI_TIME, c.TURN_RATE, c.BULLET_SPEED, c.BULLET_REPEAT,
+			c.BULLET_RAD, c.AST_SPEEDS, c.AST_DIAMS, c.NUM_FRAMES, c.PTS) + tuple(extraArgs)
+	return aiClass(*args)
+
+# broadPhase picks the collision culling, see BroadPhase.py.  pairTests
+# counts the exact circle tests of the last frame.  Set profiler to a
+# FrameProfiler to time the numbered phases of every frame, and recorder to a
+# Replay.Recorder to record the games.
+class Simulation:
+	def __init__(self, shipAI, consts=GameConstants, broadPhase="grid"):
+		self.shipAI = shipAI
+		self.consts = consts
+		self.broadPhase = createBroadPhase(broadPhase, consts)
+		self.pairTests = 0
+		self.profiler = None
+		self.recorder = None
+		self.alive = False
+		self.gameScore = 0
+		self.asteroids = BodyArrays()
+		# The asteroids handed to the AI, kept in step with self.asteroids
+		self.view = WorldView()
+		self.bullets = BulletRing(bulletCapacity(consts))
+		self.bulletLife = bulletLife(consts)
+
+		WC_SZ = consts.FIELD_SZ // 2
+		# Spawn coordinates keep the asteroids away from the ship, see
+		# spawnAsteroids in main.py.
+		self.spawnCoords = tuple(range(-WC_SZ, -WC_SZ // 2)) + tuple(range(WC_SZ // 2, WC_SZ))
+
+	def newGame(self, seed):
+		self.rng = random.Random(seed)
+		self.hits = [0,0,0,0]
+		self.currFrame = 0
+		self.shieldUsed = False
+		self.shieldActive = False
+		self.shieldFrames = 0
+		self.heading = 0		# panda 0 degrees is 90 for us
+		self.framesToFire = 0
+		self.currID = 0
+		self.slowFrames = 0
+		self.gameScore = 0
+		self.alive = True
+		if self.profiler:
+			self.profiler.newGame(seed)
+		self.bullets.clear()
+		self.asteroids.clear()
+		self.view.clear()
+		self.spawnAsteroids()
+		if self.recorder:
+			self.recorder.newGame(self, seed)
+		# main.py spawns from the global random module, so an AI that uses it
+		# sees the sequence continue from there.  Do the same, whatever process
+		# the game runs in.
+		random.setstate(self.rng.getstate())
+		self.shipAI.newGame()
+
+	def spawnAsteroids(self):
+		c = self.consts
+		for i in range(c.INIT_NUM_ASTEROIDS):
+			x = self.rng.choice(self.spawnCoords)
+			y = self.rng.choice(self.spawnCoords)
+			heading = self.rng.random() * 2 * pi
+			self.currID += 1
+			(vx, vy) = (cos(heading) * c.AST_SPEEDS[0], sin(heading) * c.AST_SPEEDS[0])
+			self.asteroids.add(self.currID, x, y, vx, vy, c.AST_DIAMS[0] / 2.0)
+			self.view.spawn(self.currID, x, y, vx, vy, c.AST_DIAMS[0] / 2.0)
+
+	# A copy of the game as it is now, for looking ahead: play it on with
+	# advance(cmd), by the same rules, without touching this game.  The
+	# asteroid and bullet arrays are shared until one of the two games moves
+	# on (see BodyArrays.fork), so a fork costs a few microseconds.  A fork
+	# has no AI, view (its snapshot is empty), profiler or recorder.  Keep a
+	# fork as a saved state and fork it again to go back to it.
+	def fork(self):
+		other = copy.copy(self)
+		other.asteroids = self.asteroids.fork()
+		other.bullets = self.bullets.fork()
+		other.hits = list(self.hits)
+		other.broadPhase = copy.copy(self.broadPhase)
+		other.view = NULL_VIEW
+		other.shipAI = None
+		other.profiler = None
+		other.recorder = None
+		return other
+
+	# Plays the game started with seed to the end and returns its score.
+	def run(self, seed):
+		self.newGame(seed)
+		while self.step():
+			pass
+		return self.gameScore
+
+	# The information handed to the AI, step 0 of gameLoop.  The MovingObjects
+	# of the WorldView are only moved to the asteroids' new positions, not
+	# built again.
+	def snapshot(self):
+		a = self.asteroids
+		self.view.update(a.pos[a.live()])
+		return self.view
+
+	# Asks the AI for a command and plays one frame with it.  Returns False
+	# once the game is over.
+	def step(self):
+		if not self.alive:
+			return False
+		prof = self.profiler
+		if prof:
+			prof.beginFrame()
+
+		# 0. gather information about asteroids
+		rocks = self.snapshot()
+		if prof:
+			prof.mark(0)
+
+		# 1. Get ship's command
+		startTime = time.time()
+		cmd = self.shipAI.getAICommand(rocks, normalizeDegrees(self.heading + 90), self.framesToFire)
+		if time.time() - startTime > self.consts.AI_TIME:
+			self.slowFrames += 1
+		if prof:
+			prof.mark(1)
+
+		return self.playFrame(cmd)
+
+	# Plays one frame with the given command: (fire, turnDir), or None for the
+	# shield.  Returns False once the game is over.
+	def advance(self, cmd):
+		if not self.alive:
+			return False
+		if self.profiler:
+			self.profiler.beginFrame()
+		self.view.dropEvents()
+		return self.playFrame(cmd)
+
+	def playFrame(self, cmd):
+		c = self.consts
+		prof = self.profiler
+		if self.recorder:
+			self.recorder.frame(self, cmd)
+
+		if cmd == None:
+			if not self.shieldUsed:
+				self.shieldUsed = True
+				self.shieldFrames = c.SHIELD_LIFE
+				self.shieldActive = True
+			cmd = (False, 0)
+
+		#2 Perform ship's command
+		self.updateShip(cmd[0], cmd[1])
+		if prof:
+			prof.mark(2)
+
+		#3 Update asteroids
+		WC_SZ = c.FIELD_SZ / 2
+		self.asteroids.move(c.DT, WC_SZ)
+		if prof:
+			prof.mark(3)
+
+		#4 Update bullets.  A bullet that wrapped sits on the edge and is
+		# removed, as is one that outlived BULLET_LIFE or BULLET_RANGE.
+		b = self.bullets
+		b.move(c.DT, WC_SZ)
+		b.alive &= ~(np.abs(b.pos) == WC_SZ).any(axis=1)
+		b.expire(self.bulletLife)
+		if prof:
+			prof.mark(4)
+
+		#5 Check bullet collision with asteroids
+		a = self.asteroids
+		self.pairTests = 0
+		numBuilt = self.collideBullets()
+		if prof:
+			prof.mark(5)
+
+		#6 Update score
+		self.gameScore = self.hits[0] * c.PTS[0] + \
+						self.hits[1] * c.PTS[1] + \
+						self.hits[2] * c.PTS[2] - \
+						self.hits[3] * c.PTS[3]
+		if prof:
+			prof.mark(6)
+
+		#7 Check if game is over:
+		#  A. maximum number of frames processed
+		#  B. Check is ship collided with asteroid
+		over = self.currFrame == c.NUM_FRAMES
+		if not over:
+			if self.shieldActive:
+				self.shieldFrames -= 1
+				if self.shieldFrames == 0:
+					self.shieldActive = False
+			elif len(a.touching(self.candidates(0.0, 0.0, c.SHIP_RAD, numBuilt), 0.0, 0.0, c.SHIP_RAD)) > 0:
+				over = True
+
+		if prof:
+			prof.mark(7)
+			prof.endFrame(self.currFrame, a.numAlive(), b.numAlive(), self.pairTests)
+		if over:
+			self.alive = False
+			return False
+
+		if a.count > 2 * a.numAlive() + 16:
+			a.compact()
+		self.currFrame += 1
+		return True
+
+	# Every live bullet, oldest first, hits the asteroids it touches.  Returns
+	# the number of asteroid slots the broad phase was built on.
+	def collideBullets(self):
+		a = self.asteroids
+		b = self.bullets
+		self.broadPhase.build(a)
+		numBuilt = a.count
+		for i in b.live().tolist():
+			# Every asteroid touching the bullet is hit, last one first.  A hit
+			# only changes the asteroid itself and appends its twin, so the
+			# touching test can be done for all candidates up front.
+			hits = a.touching(self.candidates(b.pos[i, 0], b.pos[i, 1], b.rad[i], numBuilt),
+							  b.pos[i, 0], b.pos[i, 1], b.rad[i])
+			for j in hits[::-1].tolist():
+				self.asteroidHit(j)
+			if len(hits) > 0:
+				b.kill(i)
+		return numBuilt
+
+	# Asteroid slots that may touch the circle at (x, y): the broad phase
+	# candidates plus the twins split off after it was built
+	def candidates(self, x, y, rad, numBuilt):
+		slots = self.broadPhase.query(x, y, rad)
+		if self.asteroids.count > numBuilt:
+			slots = np.concatenate((slots, np.arange(numBuilt, self.asteroids.count)))
+		self.pairTests += len(slots)
+		return slots
+
+	# The handler when the asteroid in slot i is hit by a bullet
+	def asteroidHit(self, i):
+		c = self.consts
+		a = self.asteroids
+		a.own()
+		size = int(a.size[i])
+		self.hits[size] += 1
+		# If the asteroid is small it is simply removed
+		if size == len(c.AST_DIAMS) - 1:
+			a.kill(i)
+			self.view.destroy(int(a.ids[i]))
+			return
+
+		# Otherwise it shrinks and turns perpendicular to its old direction,
+		# and a twin is launched the opposite way.
+		size += 1
+		rad = c.AST_DIAMS[size] / 2.0
+		newSpeed = c.AST_SPEEDS[size]
+		(vx, vy) = a.vel[i].tolist()
+		speed = sqrt(vx * vx + vy * vy)
+		(vx, vy) = (-vy / speed * newSpeed, vx / speed * newSpeed)
+		a.vel[i] = (vx, vy)
+		a.rad[i] = rad
+		a.size[i] = size
+		oldID = int(a.ids[i])
+		self.currID += 1
+		a.ids[i] = self.currID
+
+		self.currID += 1
+		(x, y) = a.pos[i].tolist()
+		a.add(self.currID, x, y, -vx, -vy, rad, size)
+		self.view.split(oldID, self.currID - 1, self.currID, x, y, vx, vy, rad)
+
+	def updateShip(self, fire, turnDir):
+		if fire and self.framesToFire <= 0 and not self.shieldActive:
+			self.fire()
+			self.framesToFire = self.consts.BULLET_REPEAT
+			self.hits[3] += 1
+		else:
+			self.heading = (self.heading + turnDir * self.consts.TURN_RATE) % 360
+			self.framesToFire -= 1
+
+	# Creates a bullet at the ship and adds it to the bullet list
+	def fire(self):
+		c = self.consts
+		direction = radians(self.heading + 90)
+		self.bullets.add(0, 0.0, 0.0, cos(direction) * c.BULLET_SPEED,
+						 sin(direction) * c.BULLET_SPEED, c.BULLET_RAD)
+
+# Plays one game for every seed with a single AI, the way AsteroidsDemo does,
+# and returns the list of scores.
+def runGames(aiClass=ShipAI, seeds=None, consts=GameConstants, extraArgs=(), broadPhase="grid"):
+	if seeds == None:
+		seeds = consts.SEEDS
+	sim = Simulation(createShipAI(aiClass, consts, extraArgs), consts, broadPhase)
+	return [sim.run(seed) for seed in seeds]
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	for consts in scenarioArgs(args):
+		startTime = time.time()
+		scores = runGames(consts=consts, broadPhase=args[0] if len(args) > 0 else "grid")
+		print("Scenario " + scenarioName(consts))
+		for i in range(len(scores)):
+			print("Game #%d: %d" % (i + 1, scores[i]))
+		print("Total " + str(sum(scores)))
+		print("%.2f seconds" % (time.time() - startTime))
@@ -0,0 +1,142 @@
+# Per-asteroid threat data, kept from frame to frame by asteroid ID.
+#
+# An asteroid flies in a straight line at a constant velocity until it
+# wraps or is split, and a split gives it a new ID.  So the closed-form
+# answers an AI needs about it only have to be solved once, when the ID is
+# first seen:
+#
+#	contact     -- when it touches the ship, a ship at rest at the origin as
+#	               in collideWithObject, see impact()
+#	shield      -- the frames at which its position a frame (dt) later is
+#	               inside the ship's reach, the test an AI uses to raise the
+#	               shield, see shieldFrames()
+#	wrapX/wrapY -- when it wraps over the left/right and bottom/top edge,
+#	               see wrapTime()
+#
+# The times are kept on the cache's own clock, which moves on by dt on
+# every update(), so each frame only costs a lookup per asteroid.  IDs that
+# are gone are dropped.  An asteroid that isn't where its entry says it
+# should be (it wrapped, or frames were skipped) is solved again.
+#
+# Like collideWithObject the impact time ignores wrapping; the wrap times
+# tell when a prediction stops holding.
+
+from SecondOrderPoly import solveQuadraticEquation
+
+# How far, in field units, an asteroid may be from where its entry predicts
+# before the entry is solved again
+TOLERANCE = 0.01
+
+class Threat(object):
+	__slots__ = ["id", "x", "y", "vx", "vy", "start", "contact", "shield", "wrapX", "wrapY", "seen"]
+
+class ThreatCache:
+	def __init__(self, shipRad, dt, fieldSz):
+		self.shipRad = shipRad
+		self.dt = dt
+		self.halfSz = fieldSz / 2.0
+		self.newGame()
+
+	def newGame(self):
+		self.threats = {}
+		self.frame = 0
+		self.now = 0.0
+
+	# Moves the clock on one frame and brings the entries in line with the
+	# asteroids (MovingObjects) on the field now
+	def update(self, asteroids):
+		self.frame += 1
+		self.now = self.frame * self.dt
+		threats = self.threats
+		for asteroid in asteroids:
+			threat = threats.get(asteroid.id)
+			if threat == None or not self.holds(threat, asteroid):
+				threat = threats[asteroid.id] = self.solve(asteroid)
+			threat.seen = self.frame
+		if len(threats) != len(asteroids):
+			for idNum in [idNum for (idNum, threat) in threats.items() if threat.seen != self.frame]:
+				del threats[idNum]
+
+	def holds(self, threat, asteroid):
+		t = self.now - threat.start
+		return abs(threat.x + threat.vx * t - asteroid.pos[0]) <= TOLERANCE and \
+			   abs(threat.y + threat.vy * t - asteroid.pos[1]) <= TOLERANCE
+
+	# The entry of an asteroid seen at its current position.  contact is the
+	# (first, last) time it touches the ship and shield the (first, last)
+	# frame its shield test triggers, or None.
+	def solve(self, asteroid):
+		threat = Threat()
+		threat.id = asteroid.id
+		(x, y) = (asteroid.pos[0], asteroid.pos[1])
+		(vx, vy) = (asteroid.vel[0], asteroid.vel[1])
+		(threat.x, threat.y, threat.vx, threat.vy) = (x, y, vx, vy)
+		threat.start = self.now
+		reach = asteroid.rad + self.shipRad
+		dt = self.dt
+
+		# |pos + vel * t| = reach
+		a = vx * vx + vy * vy
+		b = 2 * (x * vx + y * vy)
+		c = x * x + y * y - reach * reach
+		threat.contact = None
+		threat.shield = None
+		if a == 0:
+			# At rest: touching for ever or never
+			if c <= 0:
+				threat.contact = (self.now, float("inf"))
+			if c < 0:
+				threat.shield = (self.frame, float("inf"))
+		else:
+			roots = solveQuadraticEquation(a, b, c)
+			if len(roots) > 0:
+				(first, last) = (roots[0], roots[-1])
+				threat.contact = (self.now + first, self.now + last)
+				# Frames k with |pos + vel * dt * (k + 1)| < reach
+				k = max(0, int(first // dt))
+				while (k + 1) * dt <= first:
+					k += 1
+				end = int(last // dt)
+				while end >= 0 and (end + 1) * dt >= last:
+					end -= 1
+				if k <= end:
+					threat.shield = (self.frame + k, self.frame + end)
+
+		threat.wrapX = self.crossing(x, vx, asteroid.rad)
+		threat.wrapY = self.crossing(y, vy, asteroid.rad)
+		return threat
+
+	# When a coordinate moving at speed v leaves the field, see BodyArrays.move
+	def crossing(self, x, v, rad):
+		if v > 0:
+			return self.now + (self.halfSz + rad - x) / v
+		elif v < 0:
+			return self.now + (x + rad + self.halfSz) / -v
+		return None
+
+	def get(self, idNum):
+		return self.threats.get(idNum)
+
+	# Seconds from now until asteroid idNum touches the ship, 0 if it does
+	# already, None if it never will: collideWithObject against the ship
+	def impact(self, idNum):
+		contact = self.threats[idNum].contact
+		if contact == None or contact[1] < self.now:
+			return None
+		return max(contact[0] - self.now, 0.0)
+
+	# Frames from now until the shield test of asteroid idNum triggers, 0 for
+	# this frame, None if it never does
+	def shieldFrames(self, idNum):
+		shield = self.threats[idNum].shield
+		if shield == None or shield[1] < self.frame:
+			return None
+		return max(shield[0] - self.frame, 0)
+
+	# Seconds from now until asteroid idNum wraps, None if it doesn't move
+	def wrapTime(self, idNum):
+		threat = self.threats[idNum]
+		times = [t for t in (threat.wrapX, threat.wrapY) if t != None]
+		if len(times) == 0:
+			return None
+		return min(times) - self.now
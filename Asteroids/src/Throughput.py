@@ -0,0 +1,143 @@
+# End-to-end throughput tracking.
+#
+# Plays the games of SEEDS headless (see Tournament.py), measures the wall
+# time and the simulated frames per second of every game and appends the run
+# to a history file, one JSON record per line, keyed by the git revision.
+# Each record also keeps the per-game scores and hits, and the scenario
+# with all its constants (see Scenario.py).
+#
+# A run is compared with the baseline, the latest record marked as one for
+# the same AI and constants (the first run becomes the baseline).  It fails,
+# with exit status 1, when the frames per second drop by more than the
+# threshold or when any game's score changed, so a speed-up that changes how
+# the game plays shows up straight away.  After an intended change, record a new
+# baseline with --baseline.
+#
+# Usage:  python Throughput.py [--history PATH] [--threshold FRACTION]
+#                              [--workers N] [--ai MODULE.CLASS] [--baseline]
+#                              [--scenario PATH]
+#
+# A sweep scenario is measured and checked scenario by scenario.
+
+import json
+import os
+import subprocess
+import sys
+import time
+import GameConstants
+from Scenario import constantsOf, scenarioArgs, scenarioName
+from ShipAI import ShipAI
+from Tournament import runTournament, totalScore
+
+HISTORY = "throughput.jsonl"
+THRESHOLD = 0.1			# largest allowed drop in frames per second
+
+# (revision, dirty) of the working tree, ("unknown", False) outside git
+def gitRevision(path="."):
+	try:
+		revision = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=path,
+										   stderr=subprocess.STDOUT).decode().strip()
+		status = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+										 cwd=path).decode().strip()
+		return (revision, status != "")
+	except (OSError, subprocess.CalledProcessError):
+		return ("unknown", False)
+
+def loadHistory(path=HISTORY):
+	if not os.path.exists(path):
+		return []
+	with open(path) as f:
+		return [json.loads(line) for line in f if line.strip()]
+
+def appendHistory(record, path=HISTORY):
+	with open(path, "a") as f:
+		f.write(json.dumps(record, sort_keys=True) + "\n")
+
+# Plays the seeds and returns the history record of the run.  workers is 1
+# by default, so the games don't compete for the CPU while being timed.
+def measure(aiClass=ShipAI, seeds=None, workers=1, consts=GameConstants, extraArgs=()):
+	if seeds == None:
+		seeds = consts.SEEDS
+	startTime = time.time()
+	results = runTournament(aiClass, seeds, workers, consts, extraArgs)
+	wall = time.time() - startTime
+	(revision, dirty) = gitRevision(os.path.dirname(os.path.abspath(__file__)))
+	frames = sum(result.frames for result in results)
+	gameSeconds = sum(result.seconds for result in results)
+	return {
+		"revision": revision,
+		"dirty": dirty,
+		"time": time.strftime("%Y-%m-%d %H:%M:%S"),
+		"ai": aiClass.__module__ + "." + aiClass.__name__,
+		"scenario": scenarioName(consts),
+		"constants": constantsOf(consts),
+		"seeds": list(seeds),
+		"workers": workers,
+		"seconds": wall,
+		"frames": frames,
+		"fps": frames / gameSeconds if gameSeconds > 0 else 0.0,
+		"total": totalScore(results),
+		"games": [{"seed": r.seed, "score": r.score, "hits": r.hits, "frames": r.frames,
+				   "seconds": r.seconds, "fps": r.frames / r.seconds if r.seconds > 0 else 0.0}
+				  for r in results],
+	}
+
+# The latest baseline in history that record can be compared with
+def findBaseline(history, record):
+	for old in reversed(history):
+		if old.get("baseline") and old["ai"] == record["ai"] and old["seeds"] == record["seeds"] and \
+				old.get("constants") == record["constants"]:
+			return old
+	return None
+
+# Problems of record against baseline, an empty list if it passes
+def compare(record, baseline, threshold=THRESHOLD):
+	problems = []
+	drop = 1 - record["fps"] / baseline["fps"] if baseline["fps"] > 0 else 0.0
+	if drop > threshold:
+		problems.append("throughput dropped %.1f%% (%.0f -> %.0f frames/s, threshold %.1f%%)" %
+						(100 * drop, baseline["fps"], record["fps"], 100 * threshold))
+	for (old, new) in zip(baseline["games"], record["games"]):
+		if old["score"] != new["score"] or old["frames"] != new["frames"]:
+			problems.append("seed %d: score %d -> %d, frames %d -> %d" %
+							(new["seed"], old["score"], new["score"], old["frames"], new["frames"]))
+	return problems
+
+def loadClass(name):
+	(moduleName, className) = name.rsplit(".", 1)
+	return getattr(__import__(moduleName), className)
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	options = {"--history": HISTORY, "--threshold": THRESHOLD, "--workers": 1, "--ai": None}
+	for option in options:
+		if option in args:
+			i = args.index(option)
+			options[option] = type(options[option] or "")(args[i + 1])
+			del args[i:i + 2]
+	aiClass = loadClass(options["--ai"]) if options["--ai"] else ShipAI
+
+	failed = False
+	for consts in scenarioArgs(args):
+		record = measure(aiClass, workers=options["--workers"], consts=consts)
+		print("Scenario " + record["scenario"])
+		for game in record["games"]:
+			print("seed %-8d score %4d  frames %5d  %7.2fs  %8.0f frames/s" %
+				  (game["seed"], game["score"], game["frames"], game["seconds"], game["fps"]))
+		print("Total %d  %.0f frames/s  %.2f seconds  (%s%s)" % (record["total"], record["fps"], record["seconds"],
+																record["revision"][:12], "+" if record["dirty"] else ""))
+
+		history = loadHistory(options["--history"])
+		baseline = findBaseline(history, record)
+		problems = []
+		if baseline == None or "--baseline" in args:
+			record["baseline"] = True
+			print("Recorded as the baseline")
+		else:
+			print("Baseline %s of %s: %.0f frames/s" % (baseline["revision"][:12], baseline["time"], baseline["fps"]))
+			problems = compare(record, baseline, options["--threshold"])
+		appendHistory(record, options["--history"])
+		for problem in problems:
+			print("FAIL: " + problem)
+		failed = failed or len(problems) > 0
+	sys.exit(1 if failed else 0)
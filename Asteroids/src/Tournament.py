@@ -0,0 +1,165 @@
+# Plays a tournament over SEEDS on a pool of worker processes, one game per
+# task.  Every game gets a fresh AI and its own Simulation, and a game's
+# outcome only depends on its seed, so the scores and the total are the same
+# as the serial run for any number of workers.  The AI must reset its
+# per-game state in newGame() and its class must be importable by the
+# workers (defined at the top level of a module).
+#
+# Usage:  python Tournament.py [workers] [--profile PREFIX] [--deadline FALLBACK]
+#                              [--scenario PATH] [--replays DIR]
+#
+# --profile times the phases of every frame (see FrameProfiler), prints the
+# p50/p95/p99/max report of the tournament and writes it to PREFIX.json and
+# every frame to PREFIX.csv.
+#
+# --deadline runs every AI under an AIWatchdog with AI_TIME and the given
+# fallback (last, idle or shield) and prints the missed deadlines and the
+# latency histogram of every game.  Scores then depend on the machine's
+# load, so they are no longer repeatable.
+#
+# --scenario plays the constants of a scenario file or preset instead of
+# GameConstants, one tournament per scenario of a sweep (see Scenario.py).
+#
+# --replays records every game in DIR, see Replay.py.
+
+import multiprocessing
+import os
+import sys
+import time
+import types
+import GameConstants
+from AIWatchdog import AIWatchdog
+from FrameProfiler import FrameProfiler
+from Replay import Recorder
+from Scenario import scenarioArgs, scenarioName
+from ShipAI import ShipAI
+from Simulation import Simulation, createShipAI
+
+class GameResult:
+	def __init__(self, game, seed, score, hits, frames, seconds):
+		self.game = game			# 1 based, like the "Game #" lines of main.py
+		self.seed = seed
+		self.score = score
+		self.hits = hits			# [L, M, S, shots] as in AsteroidsDemo.hits
+		self.frames = frames
+		self.seconds = seconds		# wall time of the game in its worker
+		self.profile = None			# FrameProfiler rows when profiling
+		self.missed = None			# missed AI deadlines, with a watchdog
+		self.latency = None			# AIWatchdog.histogram(), with a watchdog
+
+	def __str__(self):
+		text = "Game #%d: %d   seed=%d hits=%s frames=%d %.2fs" % \
+				(self.game, self.score, self.seed, self.hits, self.frames, self.seconds)
+		if self.missed != None:
+			text += " missed=%d" % self.missed
+		return text
+
+# Runs one task (game, seed, aiClass, extraArgs, consts, broadPhase, profile,
+# fallback, replays) in a worker.  A consts module is given by name so the
+# task can be pickled; a Scenario is passed as it is.
+def playGame(task):
+	(game, seed, aiClass, extraArgs, consts, broadPhase, profile, fallback, replays) = task
+	if isinstance(consts, str):
+		consts = sys.modules.get(consts) or __import__(consts)
+	startTime = time.time()
+	shipAI = createShipAI(aiClass, consts, extraArgs)
+	watchdog = None
+	if fallback != None:
+		shipAI = watchdog = AIWatchdog(shipAI, consts.AI_TIME, fallback)
+	sim = Simulation(shipAI, consts, broadPhase)
+	if profile:
+		sim.profiler = FrameProfiler()
+	if replays != None:
+		sim.recorder = Recorder()
+	score = sim.run(seed)
+	result = GameResult(game, seed, score, list(sim.hits), sim.currFrame, time.time() - startTime)
+	if profile:
+		result.profile = sim.profiler.rows
+	if watchdog:
+		result.missed = watchdog.missed
+		result.latency = watchdog.histogram()
+	if replays != None:
+		sim.recorder.replay(sim).save(replayPath(replays, consts, game, seed))
+	return result
+
+def replayPath(directory, consts, game, seed):
+	return os.path.join(directory, "%s-game%d-seed%d.replay" % (scenarioName(consts), game, seed))
+
+# Plays one game per seed on workers processes (all cores by default) and
+# returns the GameResults in game order.  With profile each result carries
+# the FrameProfiler rows of its game, see mergeProfiles.  With a fallback
+# every AI runs under an AIWatchdog with the deadline AI_TIME.  With replays,
+# a directory, every game is recorded there.
+def runTournament(aiClass=ShipAI, seeds=None, workers=None, consts=GameConstants,
+				  extraArgs=(), broadPhase="grid", profile=False, fallback=None, replays=None):
+	if seeds == None:
+		seeds = consts.SEEDS
+	if workers == None:
+		workers = multiprocessing.cpu_count()
+	if isinstance(consts, types.ModuleType):
+		consts = consts.__name__
+	if replays != None and not os.path.isdir(replays):
+		os.makedirs(replays)
+	tasks = [(i + 1, seeds[i], aiClass, tuple(extraArgs), consts, broadPhase, profile, fallback, replays)
+			 for i in range(len(seeds))]
+
+	if workers <= 1:
+		return [playGame(task) for task in tasks]
+	pool = multiprocessing.Pool(min(workers, len(tasks)))
+	try:
+		results = list(pool.imap_unordered(playGame, tasks, chunksize=1))
+	finally:
+		pool.close()
+		pool.join()
+	return sorted(results, key=lambda result: result.game)
+
+def totalScore(results):
+	return sum(result.score for result in results)
+
+# One FrameProfiler holding the frames of every profiled game
+def mergeProfiles(results):
+	profiler = FrameProfiler()
+	for result in results:
+		if result.profile:
+			profiler.extend(result.profile)
+	return profiler
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	prefix = None
+	if "--profile" in args:
+		i = args.index("--profile")
+		prefix = args[i + 1]
+		del args[i:i + 2]
+	fallback = None
+	if "--deadline" in args:
+		i = args.index("--deadline")
+		fallback = args[i + 1]
+		del args[i:i + 2]
+	replays = None
+	if "--replays" in args:
+		i = args.index("--replays")
+		replays = args[i + 1]
+		del args[i:i + 2]
+	scenarios = scenarioArgs(args)
+	for n in range(len(scenarios)):
+		consts = scenarios[n]
+		startTime = time.time()
+		results = runTournament(workers=int(args[0]) if len(args) > 0 else None, consts=consts,
+								profile=prefix != None, fallback=fallback, replays=replays)
+		print("Scenario " + scenarioName(consts))
+		for result in results:
+			print(result)
+			if result.latency:
+				print("  latency " + " ".join("<=%gms:%d" % (bound * 1000, count)
+											   for (bound, count) in result.latency if count > 0))
+		print("Total " + str(totalScore(results)))
+		if prefix != None:
+			profiler = mergeProfiles(results)
+			print(profiler.formatReport())
+			# One pair of files per scenario of a sweep
+			name = prefix if len(scenarios) == 1 else "%s-%d" % (prefix, n + 1)
+			profiler.writeJSON(name + ".json")
+			profiler.writeCSV(name + ".csv")
+		print("%.2f seconds, slowest game %.2f seconds" % (time.time() - startTime,
+															max(result.seconds for result in results)))
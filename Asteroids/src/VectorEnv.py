@@ -0,0 +1,381 @@
+# Many headless games stepped together, for training and tuning AIs.
+#
+# A VectorEnv holds K independent games, each with its own seed, with the
+# state of all of them in batched NumPy arrays: the asteroids of game k are
+# row k of (K, N) arrays and its bullets row k of (K, C) arrays.  One call to
+# step() plays a frame of every game, so the per-frame cost is a handful of
+# array operations whatever K is, instead of K Python frames.
+#
+# The rules are those of Simulation.playFrame, step by step, and a game plays
+# exactly as it does there: same spawns, same hits, same IDs, same score.
+# Asteroid slots are never reused within a game (a game has at most N =
+# INIT_NUM_ASTEROIDS * 2^(len(AST_DIAMS)-1) asteroids in its life), so the
+# slots of a row are in creation order like BodyArrays.live.  Finding the
+# bullets that touch an asteroid is vectorized over all games; only the games
+# with a hit are then played out one by one, because the hits of a frame
+# depend on each other (a twin can be hit by a later bullet).
+#
+# An action is an index into ACTIONS, or a command as getAICommand returns
+# it.  step(actions) returns (obs, rewards, dones):
+#
+#	obs     -- an Observation: for every game the arrays of its asteroids
+#	           (pos, vel, rad, ids, alive), what a WorldView holds, and the
+#	           heading and framesToFire handed to the AI
+#	rewards -- the change in score of every game, from PTS
+#	dones   -- True for the games that ended on this frame
+#
+# A game that ends is started again with the next seed straight away, so its
+# row of obs is already the new game; its final score and frame count are
+# appended to finished.  With autoReset False it is left over instead and
+# frozen as it ended, frame count included: its ship, asteroids and bullets
+# no longer move, fire or hit, and it gets no more rewards or dones until it
+# is started again.
+#
+# loadGame() puts games in the state of a Simulation, e.g. to play many
+# continuations of one position at once (see MCTSShipAI).  capacity then
+# sets N, which must leave room for the twins of every asteroid loaded.
+#
+# Usage:  python VectorEnv.py [K ...] [--seconds S] [--scenario PATH]
+#         measures frames per second with random actions for each K
+
+import itertools
+import random
+import sys
+import time
+from math import cos, sin, pi, sqrt
+import numpy as np
+import GameConstants
+from BulletRing import bulletCapacity, bulletLife
+from MovingObject import MovingObject
+from Scenario import scenarioArgs, scenarioName
+from Vectors import Point2, Vec2
+
+# (fire, turnDir) for every action, None for the shield
+ACTIONS = [(False, 0), (False, 1), (False, -1), (True, 0), (True, 1), (True, -1), None]
+SHIELD = len(ACTIONS) - 1
+
+# Slack, in field units, of the quick test for bullets near an asteroid
+REACH_SLACK = 1e-6
+FIRE = np.array([cmd != None and cmd[0] for cmd in ACTIONS])
+TURN = np.array([0 if cmd == None else cmd[1] for cmd in ACTIONS])
+
+# (fire, turnDir, shield) arrays of actions, given as indices into ACTIONS
+# or as commands, (fire, turnDir) or None.  A command may turn by any
+# multiple of TURN_RATE, as ShipAI does.
+def commandArrays(actions):
+	if isinstance(actions, np.ndarray) and actions.dtype.kind in "iu":
+		return (FIRE[actions], TURN[actions], actions == SHIELD)
+	shield = np.array([cmd == None for cmd in actions])
+	fire = np.array([cmd != None and bool(cmd[0]) for cmd in actions])
+	turn = np.array([0 if cmd == None else cmd[1] for cmd in actions])
+	return (fire, turn, shield)
+
+# The arrays of every game handed to an AI.  They belong to the VectorEnv
+# and change on the next step.
+class Observation:
+	def __init__(self, env):
+		self.pos = env.pos
+		self.vel = env.vel
+		self.rad = env.rad
+		self.ids = env.ids
+		self.alive = env.alive
+		self.heading = (env.heading + 90) % 360
+		self.framesToFire = env.framesToFire
+
+class VectorEnv:
+	def __init__(self, numGames, seeds=None, consts=GameConstants, autoReset=True, capacity=None):
+		c = consts
+		self.consts = c
+		self.numGames = K = numGames
+		self.autoReset = autoReset
+		# Seeds are taken in order as games start; a list is cycled through
+		if seeds == None:
+			seeds = itertools.count(1)
+		elif isinstance(seeds, (list, tuple)):
+			seeds = itertools.cycle(seeds)
+		self.seeds = iter(seeds)
+		self.finished = []
+
+		WC_SZ = c.FIELD_SZ // 2
+		self.spawnCoords = tuple(range(-WC_SZ, -WC_SZ // 2)) + tuple(range(WC_SZ // 2, WC_SZ))
+		self.bulletLife = bulletLife(c)
+		self.pts = np.array([c.PTS[0], c.PTS[1], c.PTS[2], -c.PTS[3]])
+
+		N = max(c.INIT_NUM_ASTEROIDS * 2 ** (len(c.AST_DIAMS) - 1), capacity or 0)
+		self.pos = np.zeros((K, N, 2))
+		self.vel = np.zeros((K, N, 2))
+		self.rad = np.zeros((K, N))
+		self.size = np.zeros((K, N), dtype=np.int8)
+		self.ids = np.zeros((K, N), dtype=np.int64)
+		self.alive = np.zeros((K, N), dtype=bool)
+		self.count = np.zeros(K, dtype=np.int64)
+
+		C = bulletCapacity(c)
+		self.bulletPos = np.zeros((K, C, 2))
+		self.bulletVel = np.zeros((K, C, 2))
+		self.bulletAlive = np.zeros((K, C), dtype=bool)
+		self.bulletAge = np.zeros((K, C), dtype=np.int32)
+		self.head = np.zeros(K, dtype=np.int64)
+
+		self.seed = np.zeros(K, dtype=np.int64)
+		self.frame = np.zeros(K, dtype=np.int64)
+		self.hits = np.zeros((K, 4), dtype=np.int64)
+		self.score = np.zeros(K, dtype=np.int64)
+		self.heading = np.zeros(K)
+		self.framesToFire = np.zeros(K, dtype=np.int64)
+		self.currID = np.zeros(K, dtype=np.int64)
+		self.shieldUsed = np.zeros(K, dtype=bool)
+		self.shieldActive = np.zeros(K, dtype=bool)
+		self.shieldFrames = np.zeros(K, dtype=np.int64)
+		self.over = np.zeros(K, dtype=bool)
+
+		self.obs = Observation(self)
+		for k in range(K):
+			self.newGame(k)
+
+	# Starts game k again with the next seed, like Simulation.newGame
+	def newGame(self, k):
+		c = self.consts
+		seed = next(self.seeds)
+		self.seed[k] = seed
+		for arr in (self.frame, self.hits, self.score, self.heading, self.framesToFire, self.currID,
+					self.shieldUsed, self.shieldActive, self.shieldFrames, self.alive, self.count,
+					self.bulletAlive, self.head, self.over):
+			arr[k] = 0
+		rng = random.Random(seed)
+		rad = c.AST_DIAMS[0] / 2.0
+		for i in range(c.INIT_NUM_ASTEROIDS):
+			x = rng.choice(self.spawnCoords)
+			y = rng.choice(self.spawnCoords)
+			heading = rng.random() * 2 * pi
+			self.addAsteroid(k, x, y, cos(heading) * c.AST_SPEEDS[0], sin(heading) * c.AST_SPEEDS[0], rad, 0)
+
+	def addAsteroid(self, k, x, y, vx, vy, rad, size):
+		i = self.count[k]
+		self.count[k] += 1
+		self.currID[k] += 1
+		self.pos[k, i] = (x, y)
+		self.vel[k, i] = (vx, vy)
+		self.rad[k, i] = rad
+		self.size[k, i] = size
+		self.ids[k, i] = self.currID[k]
+		self.alive[k, i] = True
+
+	# The observation of the games as they are now
+	def observe(self):
+		self.obs.heading = (self.heading + 90) % 360
+		return self.obs
+
+	def reset(self):
+		for k in range(self.numGames):
+			self.newGame(k)
+		return self.observe()
+
+	# The asteroids of game k as the list of MovingObjects getAICommand takes,
+	# for running an existing AI on one of the games
+	def movingObjects(self, k):
+		result = []
+		for i in np.flatnonzero(self.alive[k]).tolist():
+			(vx, vy) = self.vel[k, i].tolist()
+			result.append(MovingObject(int(self.ids[k, i]), Point2(*self.pos[k, i].tolist()), 0,
+									   sqrt(vx * vx + vy * vy), float(self.rad[k, i]), Vec2(vx, vy)))
+		return result
+
+	# Plays one frame of every game.  actions has an action per game, an
+	# array of indices into ACTIONS or a list of commands.
+	def step(self, actions):
+		c = self.consts
+		(fire, turn, shield) = commandArrays(actions)
+		WC_SZ = c.FIELD_SZ / 2
+		live = ~self.over
+		frozen = not live.all()
+
+		# Shield
+		shield &= ~self.shieldUsed & live
+		self.shieldUsed |= shield
+		self.shieldFrames[shield] = c.SHIELD_LIFE
+		self.shieldActive |= shield
+
+		#2 Perform ship's command
+		fire &= (self.framesToFire <= 0) & ~self.shieldActive & live
+		turning = ~fire & live
+		self.heading[turning] = (self.heading[turning] + turn[turning] * c.TURN_RATE) % 360
+		self.framesToFire[turning] -= 1
+		self.framesToFire[fire] = c.BULLET_REPEAT
+		self.hits[fire, 3] += 1
+		self.fire(np.flatnonzero(fire))
+
+		#3 Update asteroids, like BodyArrays.move
+		moved = self.vel * c.DT
+		if frozen:
+			moved[self.over] = 0.0
+		self.pos += moved
+		rad = self.rad[:, :, None]
+		over = self.pos - rad > WC_SZ
+		under = ~over & (self.pos + rad < -WC_SZ)
+		np.copyto(self.pos, -WC_SZ, where=over)
+		np.copyto(self.pos, WC_SZ, where=under)
+
+		#4 Update bullets
+		b = self.bulletPos
+		moved = self.bulletVel * c.DT
+		if frozen:
+			moved[self.over] = 0.0
+		b += moved
+		over = b - c.BULLET_RAD > WC_SZ
+		under = ~over & (b + c.BULLET_RAD < -WC_SZ)
+		np.copyto(b, -WC_SZ, where=over)
+		np.copyto(b, WC_SZ, where=under)
+		self.bulletAlive &= ~(np.abs(b) == WC_SZ).any(axis=2)
+		self.bulletAge[live] += 1
+		self.bulletAlive &= self.bulletAge <= self.bulletLife
+
+		#5 Check bullet collision with asteroids in the games where a bullet
+		# touches one now
+		# (the test here leaves out the square root and has some slack, the
+		# exact one is in collideBullets)
+		(games, slots) = np.nonzero(self.bulletAlive & live[:, None])
+		d = self.pos[games] - b[games, slots][:, None, :]
+		reach = self.rad[games] + (c.BULLET_RAD + REACH_SLACK)
+		near = self.alive[games] & (d[:, :, 0] * d[:, :, 0] + d[:, :, 1] * d[:, :, 1] <= reach * reach)
+		for k in np.unique(games[near.any(axis=1)]).tolist():
+			self.collideBullets(k)
+
+		#6 Update score
+		score = self.hits.dot(self.pts)
+		rewards = score - self.score
+		self.score = score
+
+		#7 Check if game is over
+		dones = self.frame == c.NUM_FRAMES
+		countdown = ~dones & self.shieldActive & live
+		self.shieldFrames[countdown] -= 1
+		self.shieldActive &= ~(countdown & (self.shieldFrames == 0))
+		(x, y) = (self.pos[:, :, 0], self.pos[:, :, 1])
+		dist = np.sqrt(x * x + y * y)
+		crashed = (self.alive & (dist <= self.rad + c.SHIP_RAD)).any(axis=1)
+		dones |= ~countdown & crashed
+
+		dones &= live
+		self.frame[~dones & live] += 1
+		for k in np.flatnonzero(dones).tolist():
+			self.finished.append((int(self.seed[k]), int(self.score[k]), int(self.frame[k])))
+			if self.autoReset:
+				self.newGame(k)
+			else:
+				self.over[k] = True
+		return (self.observe(), rewards, dones)
+
+	# Puts the games in rows (all of them by default) in the state sim is in
+	# now, with its live asteroids in the first slots
+	def loadGame(self, sim, rows=slice(None)):
+		a = sim.asteroids
+		b = sim.bullets
+		live = a.live()
+		n = len(live)
+		twins = (2 ** (len(self.consts.AST_DIAMS) - 1 - a.size[live].astype(np.int64)) - 1).sum()
+		if n + twins > self.alive.shape[1]:
+			raise ValueError("%d asteroids and their twins don't fit in %d slots" % (n, self.alive.shape[1]))
+		self.alive[rows] = False
+		self.pos[rows, :n] = a.pos[live]
+		self.vel[rows, :n] = a.vel[live]
+		self.rad[rows, :n] = a.rad[live]
+		self.size[rows, :n] = a.size[live]
+		self.ids[rows, :n] = a.ids[live]
+		self.alive[rows, :n] = True
+		self.count[rows] = n
+		self.bulletPos[rows] = b.pos
+		self.bulletVel[rows] = b.vel
+		self.bulletAlive[rows] = b.alive
+		self.bulletAge[rows] = b.age
+		self.head[rows] = b.head
+		self.frame[rows] = sim.currFrame
+		self.hits[rows] = sim.hits
+		self.score[rows] = sim.gameScore
+		self.heading[rows] = sim.heading
+		self.framesToFire[rows] = sim.framesToFire
+		self.currID[rows] = sim.currID
+		self.shieldUsed[rows] = sim.shieldUsed
+		self.shieldActive[rows] = sim.shieldActive
+		self.shieldFrames[rows] = sim.shieldFrames
+		self.over[rows] = False
+
+	# Fires a bullet in every game of games, like Simulation.fire
+	def fire(self, games):
+		if len(games) == 0:
+			return
+		c = self.consts
+		slots = self.head[games]
+		direction = np.radians(self.heading[games] + 90)
+		self.bulletPos[games, slots] = 0.0
+		self.bulletVel[games, slots, 0] = np.cos(direction) * c.BULLET_SPEED
+		self.bulletVel[games, slots, 1] = np.sin(direction) * c.BULLET_SPEED
+		self.bulletAlive[games, slots] = True
+		self.bulletAge[games, slots] = 0
+		self.head[games] = (slots + 1) % self.bulletAlive.shape[1]
+
+	# (len(points), N) mask of the asteroids of game k touching each circle of
+	# radius rad at points, as BodyArrays.touching tests them
+	def touching(self, k, points, rad):
+		d = self.pos[k][None, :, :] - points[:, None, :]
+		dist = np.sqrt(d[:, :, 0] * d[:, :, 0] + d[:, :, 1] * d[:, :, 1])
+		return self.alive[k][None, :] & (dist <= self.rad[k][None, :] + rad)
+
+	# Step 5 of Simulation.playFrame for game k: every live bullet, oldest
+	# first, hits every asteroid it touches, last one first
+	def collideBullets(self, k):
+		C = self.bulletAlive.shape[1]
+		for s in ((np.arange(C) + self.head[k]) % C).tolist():
+			if not self.bulletAlive[k, s]:
+				continue
+			hits = np.flatnonzero(self.touching(k, self.bulletPos[k, s][None, :], self.consts.BULLET_RAD)[0])
+			for i in hits[::-1].tolist():
+				self.asteroidHit(k, i)
+			if len(hits) > 0:
+				self.bulletAlive[k, s] = False
+
+	# Simulation.asteroidHit for asteroid i of game k
+	def asteroidHit(self, k, i):
+		c = self.consts
+		size = int(self.size[k, i])
+		self.hits[k, size] += 1
+		if size == len(c.AST_DIAMS) - 1:
+			self.alive[k, i] = False
+			return
+
+		size += 1
+		rad = c.AST_DIAMS[size] / 2.0
+		newSpeed = c.AST_SPEEDS[size]
+		(vx, vy) = self.vel[k, i].tolist()
+		speed = sqrt(vx * vx + vy * vy)
+		(vx, vy) = (-vy / speed * newSpeed, vx / speed * newSpeed)
+		self.vel[k, i] = (vx, vy)
+		self.rad[k, i] = rad
+		self.size[k, i] = size
+		self.currID[k] += 1
+		self.ids[k, i] = self.currID[k]
+		(x, y) = self.pos[k, i].tolist()
+		self.addAsteroid(k, x, y, -vx, -vy, rad, size)
+
+# Frames per second of all K games together, playing random actions
+def measure(numGames, seconds=1.0, consts=GameConstants, seed=1):
+	env = VectorEnv(numGames, consts=consts)
+	rng = np.random.RandomState(seed)
+	frames = 0
+	start = time.time()
+	while time.time() - start < seconds:
+		env.step(rng.randint(0, SHIELD, numGames))
+		frames += numGames
+	return frames / (time.time() - start)
+
+if __name__ == "__main__":
+	args = sys.argv[1:]
+	seconds = 1.0
+	if "--seconds" in args:
+		i = args.index("--seconds")
+		seconds = float(args[i + 1])
+		del args[i:i + 2]
+	for consts in scenarioArgs(args):
+		print("Scenario " + scenarioName(consts))
+		for K in [int(arg) for arg in args] or [1, 10, 100, 1000, 4000]:
+			print("K %5d  %10.0f frames/s" % (K, measure(K, seconds, consts)))
@@ -0,0 +1,137 @@
+# 2-D vectors for the AI side of the game, without Panda3D.
+#
+# The AIs, MovingObject and the headless simulation only ever need a pair of
+# floats with Panda's Vec2/Point2 interface, and importing panda3d.core for
+# that costs tens of milliseconds in every process, most of all in the
+# tournament workers that never open a window.  Vec2 covers the part of
+# LVecBase2f the AIs use:
+#
+#	v[0], v[1], v.x, v.y, v.getX(), v.getY(), v.set(x, y), x, y = v
+#	v + w, v - w, -v, v * s, s * v, v / s, v == w
+#	v.length(), v.lengthSquared(), v.dot(w), v.normalized(), v.normalize()
+#
+# w may be a Panda vector or any pair, so old AIs that mix Panda's types
+# with the ones MovingObject hands them keep working.  Point2 is the same
+# type; Panda tells points and vectors apart, nothing here does.
+#
+# Panda is only imported by toPanda() and only when it is called, so code
+# that draws with Panda converts there and nowhere else.
+
+from math import sqrt
+
+class Vec2(object):
+	__slots__ = ["x", "y"]
+
+	def __init__(self, x=0.0, y=0.0):
+		self.x = x
+		self.y = y
+
+	def __getitem__(self, i):
+		return (self.x, self.y)[i]
+
+	def __setitem__(self, i, value):
+		if i == 0 or i == -2:
+			self.x = value
+		elif i == 1 or i == -1:
+			self.y = value
+		else:
+			raise IndexError("Vec2 index out of range")
+
+	def __len__(self):
+		return 2
+
+	def __iter__(self):
+		yield self.x
+		yield self.y
+
+	def getX(self):
+		return self.x
+
+	def getY(self):
+		return self.y
+
+	def setX(self, x):
+		self.x = x
+
+	def setY(self, y):
+		self.y = y
+
+	def set(self, x, y):
+		self.x = x
+		self.y = y
+
+	def __add__(self, other):
+		return Vec2(self.x + other[0], self.y + other[1])
+
+	__radd__ = __add__
+
+	def __sub__(self, other):
+		return Vec2(self.x - other[0], self.y - other[1])
+
+	def __rsub__(self, other):
+		return Vec2(other[0] - self.x, other[1] - self.y)
+
+	def __neg__(self):
+		return Vec2(-self.x, -self.y)
+
+	def __mul__(self, s):
+		return Vec2(self.x * s, self.y * s)
+
+	__rmul__ = __mul__
+
+	def __truediv__(self, s):
+		return Vec2(self.x / s, self.y / s)
+
+	__div__ = __truediv__
+
+	def __eq__(self, other):
+		try:
+			return len(other) == 2 and self.x == other[0] and self.y == other[1]
+		except TypeError:
+			return False
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	__hash__ = None
+
+	def length(self):
+		return sqrt(self.x * self.x + self.y * self.y)
+
+	def lengthSquared(self):
+		return self.x * self.x + self.y * self.y
+
+	def dot(self, other):
+		return self.x * other[0] + self.y * other[1]
+
+	def normalized(self):
+		length = self.length()
+		if length == 0:
+			return Vec2(0.0, 0.0)
+		return Vec2(self.x / length, self.y / length)
+
+	# Makes the vector unit length in place; False if it is zero, as in Panda
+	def normalize(self):
+		length = self.length()
+		if length == 0:
+			return False
+		self.x /= length
+		self.y /= length
+		return True
+
+	def __repr__(self):
+		return "Vec2(%r, %r)" % (self.x, self.y)
+
+	def __reduce__(self):
+		return (Vec2, (self.x, self.y))
+
+	# The Panda3D LVector2f, or LPoint2f with point=True, of the vector
+	def toPanda(self, point=False):
+		from panda3d.core import LPoint2f, LVector2f
+		return (LPoint2f if point else LVector2f)(self.x, self.y)
+
+Point2 = Vec2
+
+# A Vec2 of any pair, e.g. a Panda vector
+def fromPanda(v):
+	return Vec2(v[0], v[1])
@@ -0,0 +1,115 @@
+# The asteroids as the AI sees them, kept from frame to frame.
+#
+# A WorldView is the list of MovingObjects handed to getAICommand, so AIs
+# that iterate over their asteroids work unchanged.  Instead of building a
+# MovingObject, a Point2 and a Vec2 for every asteroid on every frame, the
+# objects are made once, when an asteroid appears, and only their positions
+# are updated in place.  An asteroid's velocity only changes when it splits,
+# so the vel Vec2 is set then and shared as it is.
+#
+# The changes since the last frame are listed in events, by asteroid ID:
+#
+#	("spawn", id)                  -- a new asteroid
+#	("split", id, newId, twinId)   -- asteroid id was hit, shrank and now is
+#	                                  newId; twinId was launched the other way
+#	("destroy", id)                -- a small asteroid was hit and removed
+#
+# byId maps the IDs of the asteroids on the field to their objects.  The
+# list is in the order of the live slots of the simulation's asteroid arrays
+# (see BodyArrays.live), the order the asteroids were created in.  The AI
+# gets the same list every frame, so it must copy it, not change it, if it
+# wants to reorder or filter it, and copy() it, objects and all, if it keeps
+# reading it while the game plays on.
+
+from Vectors import Point2, Vec2
+from math import sqrt
+from MovingObject import MovingObject
+
+class WorldView(list):
+	__slots__ = ["byId", "events", "pending"]
+
+	def __init__(self):
+		list.__init__(self)
+		self.byId = {}
+		self.events = []
+		self.pending = []
+
+	def add(self, idNum, x, y, vx, vy, rad):
+		obj = MovingObject(idNum, Point2(x, y), 0, sqrt(vx * vx + vy * vy), rad, Vec2(vx, vy))
+		self.append(obj)
+		self.byId[idNum] = obj
+
+	def clear(self):
+		del self[:]
+		self.byId.clear()
+		self.events = []
+		self.pending = []
+
+	def spawn(self, idNum, x, y, vx, vy, rad):
+		self.add(idNum, x, y, vx, vy, rad)
+		self.pending.append(("spawn", idNum))
+
+	# The object of asteroid idNum becomes asteroid newId, with a new velocity
+	# and radius, and the twin is added after the others at (x, y)
+	def split(self, idNum, newId, twinId, x, y, vx, vy, rad):
+		obj = self.byId.pop(idNum)
+		obj.id = newId
+		obj.speed = sqrt(vx * vx + vy * vy)
+		obj.vel = Vec2(vx, vy)
+		obj.rad = rad
+		self.byId[newId] = obj
+		self.add(twinId, x, y, -vx, -vy, rad)
+		self.pending.append(("split", idNum, newId, twinId))
+
+	def destroy(self, idNum):
+		self.remove(self.byId.pop(idNum))
+		self.pending.append(("destroy", idNum))
+
+	# Starts a frame: moves the objects to pos, the (n, 2) positions of the
+	# live asteroids in order, and makes the changes since the last call the
+	# events of this frame
+	def update(self, pos):
+		for (obj, x, y) in zip(self, pos[:, 0].tolist(), pos[:, 1].tolist()):
+			obj.pos.set(x, y)
+		self.events = self.pending
+		self.pending = []
+
+	# A copy with objects and positions of its own, for an AI that may still
+	# be reading it after the game has moved on (see AIWatchdog).  The
+	# velocities are shared: a split replaces an object's vel, it never
+	# changes it.
+	def copy(self):
+		other = WorldView()
+		for obj in self:
+			twin = MovingObject(obj.id, Point2(obj.pos[0], obj.pos[1]), 0, obj.speed, obj.rad, obj.vel)
+			other.append(twin)
+			other.byId[obj.id] = twin
+		other.events = list(self.events)
+		return other
+
+	# Forgets the changes nobody looked at, for frames played without the AI
+	def dropEvents(self):
+		if self.pending:
+			self.pending = []
+
+# The view of a Simulation.fork: lookahead plays frames without the AI, so
+# nothing is kept and the list stays empty
+class NullView(WorldView):
+	__slots__ = []
+
+	def add(self, idNum, x, y, vx, vy, rad):
+		pass
+
+	def spawn(self, idNum, x, y, vx, vy, rad):
+		pass
+
+	def split(self, idNum, newId, twinId, x, y, vx, vy, rad):
+		pass
+
+	def destroy(self, idNum):
+		pass
+
+	def update(self, pos):
+		pass
+
+NULL_VIEW = NullView()
@@ -15,63 +15,112 @@
 # could look like.
 
 from direct.showbase.ShowBase import ShowBase
-from pandac.PandaModules import LPoint3, LVector3, OrthographicLens, Point2, \
+from pandac.PandaModules import LPoint3, LVector3, OrthographicLens, PStatClient, \
 								TextNode, Vec3, TransparencyAttrib, loadPrcFileData
-import random
 from direct.task import Task
-from math import sin, cos, pi, degrees, atan2, radians
+import os
 import sys
-from ShipAI import ShipAI
-from MovingObject import MovingObject, normalizeDegrees
+import time
+import traceback
+from AIReloader import AIReloader
+from Simulation import Simulation
+from NodePool import NodePool
+from InstancedRenderer import InstancedRenderer
+from FrameProfiler import FrameProfiler
+from AIWatchdog import AIWatchdog
+from Scenario import Scenario, loadScenario
+from Replay import Recorder
 from direct.interval.IntervalGlobal import Func, Wait, Sequence
-
-def find(lst, val):
-	for i in range(len(lst)):
-		if lst[i] == val:
-			return i
-	return i
-
-def touching(obj1, obj2):
-	rad1 = obj1.getScale().getX() / 2
-	rad2 = obj2.getScale().getX() / 2
-	dist = (obj1.getPos() - obj2.getPos()).length()
-	return dist <= rad1 + rad2
-	
-SEEDS = [12513,2234,23,3,4342,          # 20 random seeds, to ensure 20 repeatable
-         954,233,786,4545423,1121,      # games.
-         3426,976443,20452,503,2237,
-         67121,36767,743,212,7524]
-
-NUM_GAMES = len(SEEDS)
-
-FIELD_SZ = 700					# dimensions of square window
-NUM_FRAMES = 2000				# number of frames in a game
-DT = 0.05						# seconds [virtual] for each frame
-AI_TIME = 0.05					# time allowed for AI
-
-INIT_NUM_ASTEROIDS = 10			# number of asteroids to start game
-
-TURN_RATE = 4					# degrees in one turn
-
-BULLET_REPEAT = 8				# frames to wait between firings
-BULLET_SPEED = 200				# speed of fired bullet
-BULLET_RAD = 2					# radius of bullet
-
-INIT_AST_SPEED = 100
-AST_SPEED_FACTOR = 1.5
-
-INIT_AST_RAD = 80
-AST_SZ_FACTOR = 0.5
-
-SHIP_RAD = 8					# radius of ship
-SHIELD_LIFE = 200				# frames of immunity
-PTS = [2, 4, 10, -1]			# points for L, M, S, shots
-
-# Computed constant quantities, don't change
-AST_DIAMS = [2*INIT_AST_RAD, 2*int(INIT_AST_RAD*AST_SZ_FACTOR), 2*int(INIT_AST_RAD*AST_SZ_FACTOR*AST_SZ_FACTOR)]
-AST_SPEEDS = [INIT_AST_SPEED, int(INIT_AST_SPEED*AST_SPEED_FACTOR), int(INIT_AST_SPEED*AST_SPEED_FACTOR*AST_SPEED_FACTOR)]
-
-loadPrcFileData("", "win-size %d %d" % (FIELD_SZ, FIELD_SZ))
+from GameConstants import *
+
+# Pass --scenario PATH to play with the constants of a scenario file or
+# preset (see Scenario.py) instead of those of GameConstants.py
+SCENARIO = Scenario()
+if "--scenario" in sys.argv[1:]:
+	SCENARIO = loadScenario(sys.argv[sys.argv.index("--scenario") + 1])
+	globals().update(SCENARIO.constants())
+
+# The lens shows the whole field, however big, in a window of at most 1000
+# pixels
+WIN_SZ = min(FIELD_SZ, 1000)
+loadPrcFileData("", "win-size %d %d" % (WIN_SZ, WIN_SZ))
+
+# Pass --instanced to draw the asteroids and bullets with hardware
+# instancing (see InstancedRenderer) instead of one node per object.
+INSTANCED = "--instanced" in sys.argv[1:]
+
+# Pass --profile to time the phases of every frame (see FrameProfiler), also
+# as PStats collectors, sent to a PStats server (pstats) if one is running.
+# The report of each game is printed when it ends and the whole run is
+# written to profile.json and profile.csv.
+PROFILE = "--profile" in sys.argv[1:]
+
+# Pass --replays DIR to record every game in DIR (see Replay.py), e.g. to
+# look into a bad score with Replay.py --frame instead of print statements.
+REPLAYS = None
+if "--replays" in sys.argv[1:]:
+	REPLAYS = sys.argv[sys.argv.index("--replays") + 1]
+	if not os.path.isdir(REPLAYS):
+		os.makedirs(REPLAYS)
+
+# Pass --ai NAME to play the AI class NAME of module NAME, or of the file
+# NAME.py given by its path (e.g. ../Asteroids/myShipAI.py), instead of
+# ShipAI.
+AI_MODULE = "ShipAI"
+if "--ai" in sys.argv[1:]:
+	AI_MODULE = sys.argv[sys.argv.index("--ai") + 1]
+
+# Pass --reload to reload the AI when its source changes (see AIReloader)
+# and restart the current game with it, without closing the window.  The
+# files are checked every RELOAD_INTERVAL seconds.  Modules the game uses
+# too, such as MovingObject, are not reloaded; an edit to one is reported
+# and needs a restart.
+RELOAD = "--reload" in sys.argv[1:]
+RELOAD_INTERVAL = 0.25
+
+# The simulation runs apart from the display: every rendered frame plays
+# the game frames due, speed of them, and only the last state is drawn.
+# Pass --speed N to start at N game frames per rendered frame, or --speed
+# max to play as many as fit in FRAME_BUDGET seconds.  Keys change it while
+# the game runs: = or + doubles the speed, - halves it, t toggles max.
+# Frames that don't fit in FRAME_BUDGET are played on later rendered frames,
+# up to MAX_BEHIND rendered frames' worth, so a slow stretch is caught up
+# without snowballing.
+SPEED = 1
+if "--speed" in sys.argv[1:]:
+	SPEED = sys.argv[sys.argv.index("--speed") + 1]
+	SPEED = SPEED if SPEED == "max" else int(SPEED)
+	if SPEED != "max" and SPEED < 1:
+		raise ValueError("--speed %d, expected max or at least 1 game frame per rendered frame" % SPEED)
+FRAME_BUDGET = 0.015			# seconds of play per rendered frame, most of one at 60 Hz
+MAX_BEHIND = 4
+
+clock = getattr(time, "perf_counter", time.time)
+
+# The constructor arguments of the AI, as Simulation.createShipAI gives
+# them.  An AI that takes one more, as myShipAI does, also gets SHIP_RAD.
+def aiArgs(aiClass):
+	args = (FIELD_SZ, AI_TIME, TURN_RATE, BULLET_SPEED, BULLET_REPEAT, BULLET_RAD,
+			AST_SPEEDS, AST_DIAMS, NUM_FRAMES, PTS)
+	if aiClass.__init__.__code__.co_argcount > len(args) + 1:
+		args += (SHIP_RAD,)
+	return args
+
+# The plane model and the textures are loaded once and shared by all objects
+models = {}
+textures = {}
+
+def loadPlane():
+	global loader
+	if "plane" not in models:
+		models["plane"] = loader.loadModel("models/plane")
+	return models["plane"]
+
+def loadTexture(tex):
+	global loader
+	if tex not in textures:
+		textures[tex] = loader.loadTexture('textures/' + tex)
+	return textures[tex]
 
 # This helps reduce the amount of code used by loading objects, since all of
 # the objects are pretty much the same.
@@ -79,8 +128,7 @@ def loadObject(tex=None, pos=LPoint3(0, 0), scale=1, transparency=True):
 	global loader, camera, render
 	# Every object uses the plane model and is parented to the camera
 	# so that it faces the screen.
-	obj = loader.loadModel("models/plane")
-	obj.reparentTo(render)
+	obj = loadPlane().copyTo(render)
 	obj.setP(-90)
 	# Set the initial position and scale.
 	obj.setPos(pos.getX(), pos.getY(), 0)
@@ -96,9 +144,8 @@ def loadObject(tex=None, pos=LPoint3(0, 0), scale=1, transparency=True):
 		obj.setTransparency(TransparencyAttrib.MAlpha)
 	
 	if tex:
-		# Load and set the requested texture.
-		tex = loader.loadTexture('textures/' + tex)
-		obj.setTexture(tex, 1)
+		# Set the requested texture, loading it on first use.
+		obj.setTexture(loadTexture(tex), 1)
 	
 	return obj
 
@@ -140,12 +187,23 @@ class AsteroidsDemo(ShowBase):
 		self.setBackgroundColor((0, 0, 0, 1))
 		self.bg = loadObject("stars.jpg", scale=FIELD_SZ, transparency=False)
 		
-		# Load the ship and set its initial velocity.
+		# Load the ship.
 		self.ship = loadObject("ship.png", scale=2*SHIP_RAD)
-		self.setTag("velocity", self.ship, LVector3.zero())
 		
 		self.accept("escape", sys.exit)  # Escape quits
 		self.accept("space", self.endGame, [0])  # Escape quits
+		self.accept("=", self.changeSpeed, [2])
+		self.accept("+", self.changeSpeed, [2])
+		self.accept("-", self.changeSpeed, [0.5])
+		self.accept("t", self.toggleMaxSpeed)
+		# Game frames per rendered frame, and whether to play as many as fit
+		# in FRAME_BUDGET instead
+		self.speed = 1 if SPEED == "max" else SPEED
+		self.maxSpeed = SPEED == "max"
+		# Game frames due and not played yet, and those played on the last
+		# rendered frame
+		self.due = 0
+		self.played = 0
 		
 		# Now we create the task. taskMgr is the task manager that actually
 		# calls the function each frame. The add method creates a new task.
@@ -154,196 +212,219 @@ class AsteroidsDemo(ShowBase):
 		# is passed to the function each frame.
 		self.gameTask = taskMgr.add(self.gameLoop, "gameLoop")
 		
-		# Stores the time at which the next bullet may be fired.
-		self.nextBullet = 0.0
-		
-		# This list will stored fired bullets.
-		self.bullets = []
+		self.reloader = AIReloader(AI_MODULE)
+		self.aiArgs = aiArgs(self.reloader.aiClass())
+		self.shipAI = self.reloader.aiClass()(*self.aiArgs)
+		if RELOAD:
+			taskMgr.doMethodLater(RELOAD_INTERVAL, self.checkReload, "checkReload")
+		# The AI answers on a worker thread.  If it misses AI_TIME the frame
+		# goes on with the AI_FALLBACK command.
+		self.watchdog = AIWatchdog(self.shipAI, AI_TIME, AI_FALLBACK)
+		# The game itself is played by the headless simulation.  The nodes
+		# below only mirror its asteroid and bullet arrays for display.
+		self.game = Simulation(self.watchdog, SCENARIO)
+		if PROFILE:
+			if not PStatClient.connect():
+				print("No PStats server, profiling without it")
+			self.game.profiler = FrameProfiler(pstats=True)
+		if REPLAYS:
+			self.game.recorder = Recorder()
 		
-		self.shipAI = ShipAI(FIELD_SZ, AI_TIME, TURN_RATE,
-							BULLET_SPEED, BULLET_REPEAT, BULLET_RAD,
-							AST_SPEEDS, AST_DIAMS, NUM_FRAMES, PTS)
-		self.currFrame = 0
+		# Asteroid ID -> (kind, node) of the asteroids on screen
+		self.asteroidNodes = {}
+		if INSTANCED:
+			self.instanced = InstancedRenderer(loadPlane(), render, loadTexture("circle.png"),
+											   loadTexture("bullet.png"))
+			self.bulletNodes = []
+		else:
+			self.instanced = None
+			# Nodes for the asteroids a game starts with, and the pair of the
+			# first split of every smaller size, are made up front.  The pool
+			# makes more as the splits need them and keeps them for the next
+			# games.  The bullets get one node per slot of the ring.
+			self.pool = NodePool(lambda tex, scale: loadObject(tex, scale=scale))
+			for size in range(len(AST_DIAMS)):
+				self.pool.addKind(("asteroid", size), "circle.png", AST_DIAMS[size],
+								  INIT_NUM_ASTEROIDS if size == 0 else 2)
+			self.pool.addKind("bullet", "bullet.png", 2*BULLET_RAD, self.game.bullets.capacity())
+			# One node per slot of the bullet ring, shown while the slot is alive
+			self.bulletNodes = [self.pool.acquire("bullet") for i in range(self.game.bullets.capacity())]
+			for node in self.bulletNodes:
+				node.stash()
 		self.currGame = 0
 		self.totalScore = 0
-		self.bullets = []
-		self.asteroids = []
 		self.ship.setColor(1,1,1)
 		self.newGame()
-		self.shieldActive = False
-		self.shieldFrames = 0
-	
-	def spawnAsteroids(self):
-		# Control variable for if the ship is alive
-		self.alive = True
-		self.asteroids = []  # List that will contain our asteroids
-		
-		for i in range(INIT_NUM_ASTEROIDS):
-			# This loads an asteroid. The texture chosen is random
-			# from "asteroid1.png" to "asteroid3.png".
-			asteroid = loadObject("circle.png", scale=AST_DIAMS[0])
-			self.asteroids.append(asteroid)
-			
-			# This is kind of a hack, but it keeps the asteroids from spawning
-			# near the player.  It creates the list (-20, -19 ... -5, 5, 6, 7,
-			# ... 20) and chooses a value from it. Since the player starts at 0
-			# and this list doesn't contain anything from -4 to 4, it won't be
-			# close to the player.
-			WC_SZ = FIELD_SZ/2
-			asteroid.setX(random.choice(tuple(range(-WC_SZ, -WC_SZ/2)) + tuple(range(WC_SZ/2, WC_SZ))))
-			# Same thing for Y
-			asteroid.setY(random.choice(tuple(range(-WC_SZ, -WC_SZ/2)) + tuple(range(WC_SZ/2, WC_SZ))))
-			
-			# Heading is a random angle in radians
-			heading = random.random() * 2 * pi
-			
-			# Converts the heading to a vector and multiplies it by speed to
-			# get a velocity vector
-			v = LVector3(cos(heading), sin(heading), 0) * AST_SPEEDS[0]
-			self.setTag("velocity", self.asteroids[i], v)
-			self.currID += 1
-			self.setTag("ID", asteroid, self.currID)
 
 	# This is our main task function, which does all of the per-frame
 	# processing.  It takes in self like all functions in a class, and task,
 	# the task object returned by taskMgr.
 	def gameLoop(self, task):
-		global globalClock
-		
 		# If the ship is not alive, do nothing.  Tasks return Task.cont to
 		# signify that the task should continue running. If Task.done were
 		# returned instead, the task would be removed and would no longer be
 		# called every frame.
-		if not self.alive:
+		if not self.game.alive:
 			return Task.cont
-	
-		# 0. gather information about asteroids
-		rocks = []
-		for r in self.asteroids:
-			v = self.getTag("velocity", r)
-			idNum = self.getTag("ID", r)
-			heading = degrees(atan2(v.getY(), v.getX()))
-			obj = MovingObject(idNum, Point2(r.getX(), r.getY()), 
-							   heading, v.length(), r.getScale()[0]/2)
-			rocks.append(obj)
-		
-		# 1. Get ship's command
-		startTime = globalClock.getLongTime()
-		cmd = self.shipAI.getAICommand(rocks, normalizeDegrees(self.ship.getH()+90), self.framesToFire)
-		#cmd = self.shipAI.opportunisticAI(rocks, normalizeDegrees(self.ship.getH()+90), self.framesToFire)
-		#cmd = self.shipAI.trackingAI(rocks, normalizeDegrees(self.ship.getH()+90), self.framesToFire)
-		#cmd = self.shipAI.aggressiveAI(rocks, normalizeDegrees(self.ship.getH()+90), self.framesToFire)
 		
-		if cmd == None:
-			if not self.shieldUsed:
-				self.ship.setColor(0,1,0)
-				self.shieldUsed = True
-				self.shieldFrames = SHIELD_LIFE
-				self.shieldActive = True
-			cmd = (False, 0)
-
-		endTime = globalClock.getLongTime()
-		if endTime - startTime > AI_TIME:
+		# Play the frames due: AI command, ship, asteroids, bullets,
+		# collisions and the end of game checks for each.
+		if self.maxSpeed:
+			self.due = float("inf")
+		else:
+			self.due += self.speed
+		startTime = clock()
+		alive = True
+		self.played = 0
+		missed = self.watchdog.missed
+		while alive and self.due >= 1:
+			alive = self.game.step()
+			self.due -= 1
+			self.played += 1
+			if clock() - startTime > FRAME_BUDGET:
+				break
+		# Reported once per rendered frame, however many of its game frames
+		# missed
+		missed = self.watchdog.missed - missed
+		if missed == 1:
 			print("Exceeded time limit")
+		elif missed > 1:
+			print("Exceeded time limit on %d of %d frames" % (missed, self.played))
+		if self.maxSpeed or not alive:
+			self.due = 0
+		else:
+			self.due = min(self.due, MAX_BEHIND * self.speed)
 		
-		#2 Perform ship's command
-		self.updateShip(cmd[0], cmd[1]);
-			
-		#3 Update asteroids-
-		for obj in self.asteroids:
-			self.updatePos(obj)
+		# Mirror the new state
+		self.ship.setH(self.game.heading)
+		if self.game.shieldActive:
+			self.ship.setColor(0,1,0)
+		else:
+			self.ship.setColor(1,1,1)
+		self.syncDisplay()
 		
-		#4 Update bullets
-		newBulletArray = []
-		for obj in self.bullets:
-			self.updatePos(obj)  # Update the bullet
-			maxCoord = FIELD_SZ / 2
-			if obj.getX() == -maxCoord or obj.getX() == maxCoord or \
-				obj.getY() == -maxCoord or obj.getY() == maxCoord: 
-				obj.removeNode()  # Otherwise, remove it from the scene.
-			else:
-				newBulletArray.append(obj)
-				
-		self.bullets = newBulletArray
-
-		#5 Check bullet collision with asteroids
-		# In short, it checks every bullet against every asteroid. This is
-		# quite slow.  A big optimization would be to sort the objects left to
-		# right and check only if they overlap.  Framerate can go way down if
-		# there are many bullets on screen, but for the most part it's okay.
-		activeBullets = []
-		for bullet in self.bullets:
-			# This range statement makes it step though the asteroid list
-			# backwards.  This is because if an asteroid is removed, the
-			# elements after it will change position in the list.  If you go
-			# backwards, the length stays constant.
-			hit = False
-			for i in range(len(self.asteroids)-1, -1, -1):
-				asteroid = self.asteroids[i]
-				# Panda's collision detection is more complicated than we need
-				# here.  This is the basic sphere collision check. If the
-				# distance between the object centers is less than sum of the
-				# radii of the two objects, then we have a collision. We use
-				# lengthSquared() since it is faster than length().
-				if touching(bullet, asteroid):
-					self.asteroidHit(i)      # Handle the hit
-					hit = True
-			if hit:
-				bullet.removeNode()
-			else:
-				activeBullets.append(bullet)
-		self.bullets = activeBullets
-
-		#6 Update scoreboard
-		gameScore =  self.hits[0] * PTS[0] + \
-					self.hits[1] * PTS[1] + \
-					self.hits[2] * PTS[2] - \
-					self.hits[3] * PTS[3]
-		scoreText = "#%d (%d) %d@%d %d@%d %d@%d %d@%d= %d" % (self.currGame, self.currFrame, self.hits[0], PTS[0], 
-																self.hits[1], PTS[1],
-																self.hits[2], PTS[2],
-																self.hits[3], PTS[3],
-																gameScore
+		# Update scoreboard
+		hits = self.game.hits
+		scoreText = "#%d (%d) %d@%d %d@%d %d@%d %d@%d= %d" % (self.currGame, self.game.currFrame, hits[0], PTS[0], 
+																hits[1], PTS[1],
+																hits[2], PTS[2],
+																hits[3], PTS[3],
+																self.game.gameScore
 																)
+		if self.maxSpeed:
+			scoreText += " max(%d)" % self.played
+		elif self.speed != 1:
+			scoreText += " x%d" % self.speed
 		self.scoreBrd.setText(scoreText)
 		
-		#7 Check if game is over: 
-		#  A. maximum number of frames processed
-		#  B. Check is ship collided with asteroid
-		if self.currFrame == NUM_FRAMES:
-			self.endGame(gameScore)
-			return Task.cont
-
-		if self.shieldActive:
-			self.shieldFrames -= 1
-			print(self.shieldFrames)
-			if self.shieldFrames == 0:
-				self.ship.setColor(1,1,1)
-				self.shieldActive = False
-		else:	
-			for ast in self.asteroids:
-				# Same sphere collision check for the ship vs. the asteroid
-				if touching(ast, self.ship):
-					print(self.ship.getPos())
-					print(ast.getPos())
-					print((ast.getPos()-self.ship.getPos()).length())
-					self.endGame(gameScore)
-					return Task.cont
-		
-		self.currFrame += 1
+		if not alive:
+			self.endGame(self.game.gameScore)
 		
 		return Task.cont    # Since every return is Task.cont, the task will
 
+	# Multiplies the game frames per rendered frame by factor, at least 1
+	def changeSpeed(self, factor):
+		self.maxSpeed = False
+		self.speed = max(int(self.speed * factor), 1)
+		self.due = 0
+		print("Speed x%d" % self.speed)
+
+	def toggleMaxSpeed(self):
+		self.maxSpeed = not self.maxSpeed
+		self.due = 0
+		print("Speed " + ("max" if self.maxSpeed else "x%d" % self.speed))
+
+	# Task: builds the AI again with the same arguments when its source
+	# changed and plays the current game again from the start with it.  An
+	# edit that doesn't load is reported and the old AI plays on.
+	def checkReload(self, task):
+		for path in self.reloader.changedShared():
+			print("%s is used by the game too, restart to play with the edit" % os.path.basename(path))
+		if not self.reloader.changed():
+			return Task.again
+		try:
+			shipAI = self.reloader.reload()(*self.aiArgs)
+		except Exception:
+			traceback.print_exc()
+			print("Reload failed, keeping the old AI")
+			return Task.again
+		self.shipAI = shipAI
+		self.watchdog.setAI(shipAI)
+		if self.game.alive:
+			print("Reloaded %s, restarting game #%d" % (AI_MODULE, self.currGame))
+			self.currGame -= 1
+			self.newGame()
+		else:
+			print("Reloaded %s" % AI_MODULE)
+		return Task.again
+
+	def syncDisplay(self):
+		if self.instanced:
+			self.instanced.sync(self.game)
+		else:
+			self.syncAsteroids()
+			self.syncBullets()
+
+	# Makes the asteroid nodes mirror the simulation's arrays.  An asteroid
+	# keeps its node while its ID lives; a split gives new IDs, so the
+	# shrunken asteroid and its twin get nodes of the new size from the pool.
+	def syncAsteroids(self):
+		a = self.game.asteroids
+		live = a.live()
+		ids = a.ids[live].tolist()
+		sizes = a.size[live].tolist()
+		pos = a.pos[live].tolist()
+		nodes = {}
+		for i in range(len(ids)):
+			entry = self.asteroidNodes.pop(ids[i], None)
+			if entry == None:
+				kind = ("asteroid", sizes[i])
+				entry = (kind, self.pool.acquire(kind))
+			entry[1].setPos(pos[i][0], pos[i][1], 0)
+			nodes[ids[i]] = entry
+		for (kind, node) in self.asteroidNodes.values():
+			self.pool.release(kind, node)
+		self.asteroidNodes = nodes
+
+	def syncBullets(self):
+		bullets = self.game.bullets
+		pos = bullets.pos.tolist()
+		alive = bullets.alive.tolist()
+		for i in range(len(self.bulletNodes)):
+			node = self.bulletNodes[i]
+			if alive[i]:
+				node.unstash()
+				node.setPos(pos[i][0], pos[i][1], 0)
+			else:
+				node.stash()
+
+	def clearNodes(self):
+		for (kind, node) in self.asteroidNodes.values():
+			self.pool.release(kind, node)
+		self.asteroidNodes = {}
+		for node in self.bulletNodes:
+			node.stash()
+		if self.instanced:
+			self.instanced.clear()
+
 	def endGame(self, gameScore):
-		self.alive = False 
-		for i in self.asteroids + self.bullets:
-			i.removeNode()
-		self.bullets = []          # Clear the bullet list
-		self.asteroids = []
+		self.game.alive = False 
+		self.clearNodes()
 		print("Game #%d: %d   %s" % (self.currGame, gameScore, self.scoreBrd.getText()))
+		print("AI latency: " + self.watchdog.formatHistogram())
+		if REPLAYS:
+			self.game.recorder.replay(self.game).save(os.path.join(REPLAYS, "game%d-seed%d.replay" %
+																   (self.currGame, SEEDS[self.currGame - 1])))
 		self.totalScore += gameScore
+		profiler = self.game.profiler
+		if profiler:
+			print(profiler.formatReport(SEEDS[self.currGame - 1]))
 		if self.currGame == NUM_GAMES:
 			print("Total " + str(self.totalScore))
+			if profiler:
+				print(profiler.formatReport())
+				profiler.writeJSON("profile.json")
+				profiler.writeCSV("profile.csv")
 			sys.exit()
 		Sequence(Func(self.ship.hide),
 				Wait(2),
@@ -352,113 +433,12 @@ class AsteroidsDemo(ShowBase):
 		return Task.cont
 		
 	def newGame(self):
-		self.hits = [0,0,0,0]
-		self.currFrame = 0
-		self.shieldUsed = False
-		self.shieldActive = False
 		self.ship.setColor(1,1,1)
 		self.ship.setH(0)		# panda 0 degrees is 90 for us
-		self.framesToFire = 0
-		self.currID = 0
-		random.seed(SEEDS[self.currGame])
+		self.clearNodes()
+		self.game.newGame(SEEDS[self.currGame])
 		self.currGame += 1
-		self.alive = True
-		for i in self.asteroids + self.bullets:
-			i.removeNode()
-		self.bullets = []
-		self.asteroids = []	
-		self.spawnAsteroids()
-		self.shipAI.newGame() 
-
-	# Updates the positions of objects
-	def updatePos(self, obj):
-		vel = self.getTag("velocity", obj)
-		newPos = obj.getPos() + vel * DT
-		
-		WC_SZ = FIELD_SZ / 2
-		# Check if the object is out of bounds. If so, wrap it
-		radius = .5 * obj.getScale().getX()
-		if newPos.getX() - radius > WC_SZ:
-			newPos.setX(-WC_SZ)
-		elif newPos.getX() + radius < -WC_SZ:
-			newPos.setX(WC_SZ)
-		if newPos.getY() - radius > WC_SZ:
-			newPos.setY(-WC_SZ)
-		elif newPos.getY() + radius < -WC_SZ:
-			newPos.setY(WC_SZ)
-		
-		obj.setPos(newPos)
-
-	# The handler when an asteroid is hit by a bullet
-	def asteroidHit(self, index):
-		currDiam = self.asteroids[index].getScale().getX()
-		# If the asteroid is small it is simply removed
-		if currDiam == AST_DIAMS[2]:
-			self.asteroids[index].removeNode()
-			del self.asteroids[index]
-			self.hits[2] += 1
-		else:
-			which = find(AST_DIAMS, currDiam)
-			self.hits[which] += 1
-			# If it is big enough, divide it up into little asteroids.
-			# First we update the current asteroid.
-			asteroid = self.asteroids[index]
-			newScale = AST_DIAMS[which+1]
-			asteroid.setScale(newScale)
-			
-			# The new direction is chosen as perpendicular to the old direction
-			# This is determined using the cross product, which returns a
-			# vector perpendicular to the two input vectors.  By crossing
-			# velocity with a vector that goes into the screen, we get a vector
-			# that is orthogonal to the original velocity in the screen plane.
-			newSpeed = AST_SPEEDS[which+1]
-			vel = self.getTag("velocity", asteroid)
-			vel.normalize()
-			vel = LVector3(0, 0, 1).cross(vel)
-			vel *= newSpeed
-			self.setTag("velocity", asteroid, vel)
-			self.currID += 1
-			self.setTag("ID", asteroid, self.currID)
-			
-			# Now we create a new asteroid identical to the current one
-			newAst = loadObject(scale=newScale)
-			self.setTag("velocity", newAst, -vel)
-			newAst.setPos(asteroid.getPos())
-			newAst.setTexture(asteroid.getTexture(), 1)
-			self.asteroids.append(newAst)
-			self.currID += 1
-			self.setTag("ID", newAst, self.currID)
-
-	# This updates the ship's position. This is similar to the general update
-	# but takes into account turn and thrust
-	def updateShip(self, fire, turnDir):
-		if fire and self.framesToFire <= 0 and not self.shieldActive:
-			self.fire()
-			self.framesToFire = BULLET_REPEAT
-			self.hits[3] += 1
-		else:
-			heading = self.ship.getH()
-			heading += turnDir * TURN_RATE
-			self.ship.setH(heading % 360)
-			self.framesToFire -= 1
-
-	# Creates a bullet and adds it to the bullet list
-	def fire(self):
-		print(self.shieldActive, self.shieldFrames)
-		direction = radians(self.ship.getH() + 90)
-		pos = self.ship.getPos()
-		bullet = loadObject("bullet.png", scale=BULLET_RAD*2)  # Create the object
-		bullet.setPos(pos)
-		vel = LVector3(cos(direction), sin(direction), 0) * BULLET_SPEED
-		self.setTag("velocity", bullet, vel)
-		self.bullets.append(bullet)
-
-	def setTag(self, tag, obj, val):
-		obj.setPythonTag(tag, val)
-	
-	def getTag(self, tag, obj):
-		return obj.getPythonTag(tag)
-	
+		self.syncDisplay()
 
 
 demo = AsteroidsDemo()